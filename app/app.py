@@ -3,11 +3,19 @@ from functools import wraps
 from datetime import datetime
 from dotenv import load_dotenv
 
-from app.transaction.transaction_service import get_user_transaction_history
+from app.db_core import DBCore
+from app.transaction.transaction_service import (
+    get_user_transaction_history,
+    TRANSACTION_HISTORY_PAGE_SIZE,
+    TRANSACTION_HISTORY_MAX_PAGE_SIZE
+)
 from app.position.position_service import get_user_position_by_symbol
 from app.portfolio.portfolio_service import get_portfolio
 from app.stock.stock_service import create_stock
-from app.exchange_data.exchange_service import ALL_SYMBOLS
+from app.exchange_data.symbol_index import ALL_SYMBOLS
+from app.exchange_data.symbol_search import search_symbols
+from app.quote.quote_service import start_quote_refresher
+from app.export.export_service import EXPORT_FORMATS, export_trades, export_transactions
 
 from flask import (
     Flask,
@@ -17,13 +25,18 @@ from flask import (
     redirect,
     url_for,
     flash,
-    send_file
+    send_file,
+    jsonify,
+    Response
 )
 
 from app.trade.trade_service import (
     buy_stock,
     sell_stock,
-    get_user_trade_history
+    place_basket_order,
+    get_user_trade_history,
+    TRADE_HISTORY_PAGE_SIZE,
+    TRADE_HISTORY_MAX_PAGE_SIZE
 )
 
 from app.user.user_service import (
@@ -48,19 +61,28 @@ from app.utils import (
     valid_last_name,
     valid_password,
     valid_deposit_and_withdraw_amount,
-    valid_num_shares
+    valid_num_shares,
+    valid_page_size
 )
 
-from app.pdf_generator import (
-    generate_portfolio_statement,
-    generate_transaction_statement,
-    generate_trade_statement
+from app.statement.statement_service import (
+    queue_statement,
+    get_statement_job
 )
 
 load_dotenv()
 
 app = Flask(__name__)
 
+# return the request-scoped database connection to the pool once the request ends
+app.teardown_appcontext(DBCore.release_request_connection)
+
+# open the pool's minimum connections up front so the first requests do not wait on connecting
+DBCore.warm_pool()
+
+# keep the shared quotes table current in the background
+start_quote_refresher()
+
 
 # tested, functional, commented
 @app.template_filter()
@@ -535,6 +557,23 @@ def sample_market():
         return render_template("sample_market.html")
 
 
+@app.route("/search_symbols", methods=["GET"])
+def symbol_search():
+    """ Returns ranked ticker and company name completions for typeahead as JSON. Served from
+        the in-memory symbol index, never from the market data provider. """
+
+    # get input
+    query = request.args.get("q", "").strip()[:50]
+
+    # ensure limit is a sensible number of results
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), 50)
+    except ValueError:
+        limit = 10
+
+    return jsonify(search_symbols(query, limit))
+
+
 # tested, functional, commented
 @app.route("/place_order", methods=["POST"])
 @login_required
@@ -599,6 +638,26 @@ def place_order():
         return redirect("/market")
         
 
+@app.route("/place_basket_order", methods=["POST"])
+@login_required
+def basket_order():
+    """ Executes a basket of buy and sell orders in one request. Expects a JSON body of the
+        form {"legs": [{"symbol": ..., "side": "BUY" or "SELL", "quantity": ...}, ...]} and
+        returns the outcome of every leg as JSON. """
+
+    # get legs of basket
+    data = request.get_json(silent=True) or {}
+    legs = data.get("legs")
+
+    # ensure legs were provided as a list of objects
+    if not isinstance(legs, list) or not all(isinstance(leg, dict) for leg in legs):
+        return jsonify({"success": False, "message": "Expected a list of order legs.", "legs": []}), 400
+
+    result = place_basket_order(session["user_id"], legs)
+
+    return jsonify(result), 200 if result["success"] else 400
+
+
 # tested, functional, commented TODO: handle if portfolio was not fetched
 @app.route("/portfolio", methods=["GET"])
 @login_required
@@ -625,21 +684,27 @@ def trades():
         # get input, user_id
         start_date = request.args.get("start_date")
         end_date = request.args.get("end_date")
+        cursor = request.args.get("cursor")
+        page_size = valid_page_size(request.args.get("page_size"), TRADE_HISTORY_PAGE_SIZE,
+                                    TRADE_HISTORY_MAX_PAGE_SIZE)
         user_id = session["user_id"]
 
-        # get user trade history
-        result = get_user_trade_history(user_id, start_date, end_date)
+        # get one page of user trade history
+        result = get_user_trade_history(user_id, start_date, end_date, page_size, cursor)
 
         # if history was fetched successfully
         if result["success"]:
             trades = result["message"]
+            next_cursor = result["next_cursor"]
         
         # if it wasn't
         else:
             
             trades = []
+            next_cursor = None
 
-        return render_template("trades.html", trades=trades)
+        return render_template("trades.html", trades=trades, next_cursor=next_cursor,
+                               page_size=page_size)
 
 
 # tested, functional, commented
@@ -653,24 +718,33 @@ def account():
         # get input, user_id
         start_date = request.args.get("start_date")
         end_date = request.args.get("end_date")
+        cursor = request.args.get("cursor")
+        page_size = valid_page_size(request.args.get("page_size"), TRANSACTION_HISTORY_PAGE_SIZE,
+                                    TRANSACTION_HISTORY_MAX_PAGE_SIZE)
         user_id = session["user_id"]
         
-        # get user transaction history
-        result = get_user_transaction_history(user_id, start_date, end_date)
+        # get one page of user transaction history
+        result = get_user_transaction_history(user_id, start_date, end_date, page_size, cursor)
 
         # if results were fetched successfully
         if result["success"]:
             transactions = result["message"]
+            next_cursor = result["next_cursor"]
+            total_transactions = result["total"]
         
         # if results were not fetched
         else:
             flash(result["message"], "danger")
             transactions = []
+            next_cursor = None
+            total_transactions = 0
         
         # get user portfolio
         portfolio = get_portfolio(user_id)
 
-        return render_template("account.html", transactions=transactions, portfolio=portfolio)
+        return render_template("account.html", transactions=transactions, portfolio=portfolio,
+                               next_cursor=next_cursor, total_transactions=total_transactions,
+                               page_size=page_size)
 
 
 # tested, functional, commented
@@ -745,15 +819,15 @@ def portfolio_statement():
     # get user object
     user_id = session["user_id"]
 
-    # generate pdf file
-    pdf_file = generate_portfolio_statement(user_id)
+    # queue pdf file for rendering
+    result = queue_statement("portfolio", user_id)
 
-    # ensure it was generated
-    if not pdf_file:
+    # ensure it was queued
+    if not result["success"]:
         flash("Failed generating portfolio statement.", "danger")
         return redirect("/portfolio")
 
-    return send_file(pdf_file, as_attachment=True)
+    return redirect(url_for("statement_job", job_id=result["message"]))
 
 
 # tested, functional, commented
@@ -767,24 +841,18 @@ def trade_history():
 
     # check date constraints on query
     if history_type == "all":
-        trades_result = get_user_trade_history(user_id)
+        result = queue_statement("trades", user_id)
     else:
         start_date = request.form.get("start_date")
         end_date = request.form.get("end_date")
-        trades_result = get_user_trade_history(user_id, start_date, end_date)
+        result = queue_statement("trades", user_id, start_date, end_date)
 
-    # ensure trades were fetched
-    if not trades_result["success"]:
-        flash("No trades found for the selected period.", "danger")
+    # ensure statement was queued
+    if not result["success"]:
+        flash("Please enter a valid date range.", "danger")
         return redirect("/trades")
 
-    # extract list of trade objects
-    trades = trades_result["message"]  
-
-    # generate pdf file
-    pdf_file = generate_trade_statement(user_id, trades)  
-
-    return send_file(pdf_file, as_attachment=True)
+    return redirect(url_for("statement_job", job_id=result["message"]))
 
 
 # tested, functional, commented
@@ -798,27 +866,103 @@ def transaction_history():
 
     # check date constraints on query
     if history_type == "all":
-        tx_result = get_user_transaction_history(user_id)
+        result = queue_statement("transactions", user_id)
     else:
         start_date = request.form.get("start_date")
         end_date = request.form.get("end_date")
-        tx_result = get_user_transaction_history(user_id, start_date, end_date)
+        result = queue_statement("transactions", user_id, start_date, end_date)
 
-    # ensure transactions were fetched
-    if not tx_result["success"]:
-        flash("No transactions found for the selected period.", "danger")
+    # ensure statement was queued
+    if not result["success"]:
+        flash("Please enter a valid date range.", "danger")
         return redirect("/account")
 
-    # extract list of transaction objects
-    transactions = tx_result["message"]
+    return redirect(url_for("statement_job", job_id=result["message"]))
+
+
+@app.route("/statements/<job_id>", methods=["GET"])
+@login_required
+def statement_job(job_id):
+    """ Shows the progress of a queued statement, refreshing until it can be downloaded. """
+
+    job = get_statement_job(job_id, session["user_id"])
+
+    # ensure job exists and belongs to user
+    if job is None:
+        flash("Statement not found, please request it again.", "danger")
+        return redirect("/portfolio")
+
+    return render_template("statement_job.html", job=job.to_dict())
+
+
+@app.route("/statements/<job_id>/status", methods=["GET"])
+@login_required
+def statement_job_status(job_id):
+    """ Returns the status of a queued statement as JSON. """
+
+    job = get_statement_job(job_id, session["user_id"])
+
+    if job is None:
+        return jsonify({"job_id": job_id, "status": "unknown"}), 404
+
+    return jsonify(job.to_dict())
+
 
-    # generate pdf file
-    pdf_file = generate_transaction_statement(user_id, transactions)
+@app.route("/statements/<job_id>/download", methods=["GET"])
+@login_required
+def statement_download(job_id):
+    """ Sends a rendered statement. """
+
+    job = get_statement_job(job_id, session["user_id"])
+
+    # ensure statement has been rendered
+    if job is None or job.filepath is None:
+        flash("Statement is not ready.", "danger")
+        return redirect(url_for("statement_job", job_id=job_id))
 
-    return send_file(pdf_file, as_attachment=True)
+    download_name = f"{job.kind}_statement_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return send_file(job.filepath, as_attachment=True, download_name=download_name)
 
 
+@app.route("/export/<history>", methods=["GET"])
+@login_required
+def export_history(history):
+    """ Streams the user's trades or transactions as csv or ndjson. Rows are read from the
+        database and written to the response in chunks, so exports of any size use the
+        same memory. """
+
+    # get input, user_id
+    export_format = request.args.get("format", "csv").lower()
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
+    user_id = session["user_id"]
+
+    exporters = {
+        "trades": (export_trades, "/trades"),
+        "transactions": (export_transactions, "/account")
+    }
 
+    # ensure history type is known
+    if history not in exporters:
+        flash("Invalid export.", "danger")
+        return redirect("/portfolio")
+
+    exporter, page = exporters[history]
+
+    # ensure format is supported
+    if export_format not in EXPORT_FORMATS:
+        flash("Please choose a csv or ndjson export.", "danger")
+        return redirect(page)
+
+    try:
+        rows = exporter(user_id, export_format, start_date, end_date)
+    except ValueError:
+        flash("Please enter a valid date range.", "danger")
+        return redirect(page)
+
+    filename = f"{history}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    return Response(rows, mimetype=EXPORT_FORMATS[export_format],
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+""" Compares revaluing every account by calling get_portfolio once per user with the bulk
+    revaluation pass, which values each chunk of users in one set-based statement, with one
+    and several workers. Reports users per second and checks that the bulk valuations match
+    get_portfolio. The seeded users hold the same popular symbols, are committed so that
+    every worker connection sees them, and are deleted at the end.
+
+    Run with: python -m app.benchmarks.bench_bulk_revaluation [--users N] [--holdings N] """
+
+import argparse
+import time
+
+from app.db_core import DBCore
+from app.portfolio.portfolio_repo import get_portfolio_valuation
+from app.portfolio.portfolio_revaluation import revalue_all_portfolios
+from app.portfolio.portfolio_service import get_portfolio
+from app.benchmarks.bench_utils import seed_user, seed_positions, print_table
+
+# users valued one at a time with get_portfolio, throughput is extrapolated from them
+SAMPLE_USERS = 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk revaluation of every user.")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--holdings", type=int, default=20, help="symbols held by each user")
+    parser.add_argument("--lots", type=int, default=3, help="lots per holding")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor() as cur:
+            user_ids = []
+            for _ in range(args.users):
+                user_id = seed_user(cur)
+                seed_positions(cur, user_id, args.holdings, args.lots)
+                user_ids.append(user_id)
+
+            cur.execute("""
+                INSERT INTO quotes (symbol, price, as_of)
+                SELECT 'b' || s, 100 + s, CURRENT_TIMESTAMP FROM generate_series(1, %s) AS s
+                ON CONFLICT (symbol) DO UPDATE SET price = EXCLUDED.price, as_of = EXCLUDED.as_of
+            """, (args.holdings,))
+        conn.commit()
+
+    try:
+        first, last = min(user_ids), max(user_ids)
+        rows = []
+
+        sample = user_ids[:SAMPLE_USERS]
+        start = time.perf_counter()
+        portfolios = {user_id: get_portfolio(user_id, use_cache=False) for user_id in sample}
+        elapsed = time.perf_counter() - start
+        rows.append(["get_portfolio per user", 1, len(sample), f"{len(sample) / elapsed:.0f}"])
+
+        for workers in sorted({1, args.workers}):
+            result = revalue_all_portfolios(workers, args.chunk_size, fetch_quotes=False,
+                                            first_user_id=first, last_user_id=last)
+            rows.append(["bulk revaluation", workers, result["users"], f"{result['users_per_second']:.0f}"])
+
+        # bulk valuations must match get_portfolio
+        mismatched = 0
+        with DBCore.get_connection() as conn:
+            with conn.cursor() as cur:
+                for user_id, portfolio in portfolios.items():
+                    valuation = get_portfolio_valuation(cur, user_id)
+                    if abs(float(valuation["portfolio_value"]) - portfolio.portfolio_value) > 0.01:
+                        mismatched += 1
+
+        print_table(["path", "workers", "users", "users_per_sec"], rows)
+        print()
+        print(f"{mismatched} of {len(portfolios)} sampled valuations differ from get_portfolio.")
+
+    finally:
+        with DBCore.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(""" DELETE FROM users WHERE id = ANY(%s) """, (user_ids,))
+                cur.execute(""" DELETE FROM quotes WHERE symbol IN
+                                (SELECT 'b' || s FROM generate_series(1, %s) AS s) """, (args.holdings,))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+""" Places buy orders from many threads against a few users to measure orders per second of
+    buy_stock and to check that concurrent orders never overdraw a cash balance. Prices come
+    from the offline SyntheticProvider. The seeded users, with their trades and positions,
+    are deleted at the end.
+
+    Run with: python -m app.benchmarks.bench_buy_orders [--threads N] [--orders N] [--users N] """
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.db_core import DBCore
+from app.stock.market_data_provider import SyntheticProvider, set_provider
+from app.stock.stock_service import QUOTE_CACHE
+from app.trade.trade_service import buy_stock
+from app.benchmarks.bench_utils import seed_user, print_table
+
+SYMBOL = "bnch"
+STARTING_CASH = 50000.00
+
+
+def check_balances(cur, user_ids):
+    """ Accepts a cursor and list of user ids, returns the number of users whose cash balance
+        is negative or does not equal their starting cash less the total of their buys. """
+
+    cur.execute("""
+        SELECT u.id, u.cash_balance, COALESCE(SUM(t.trade_total), 0)
+        FROM users u LEFT JOIN trades_log t ON t.user_id = u.id
+        WHERE u.id = ANY(%s)
+        GROUP BY u.id, u.cash_balance
+    """, (user_ids,))
+
+    inconsistent = 0
+    for user_id, cash_balance, spent in cur.fetchall():
+        if cash_balance < 0 or abs(float(cash_balance) - (STARTING_CASH - float(spent))) > 0.01:
+            inconsistent += 1
+    return inconsistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent buy orders.")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=4, help="fewer users means more contention")
+    args = parser.parse_args()
+
+    set_provider(SyntheticProvider())
+    QUOTE_CACHE.clear()
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor() as cur:
+            user_ids = [seed_user(cur, STARTING_CASH) for _ in range(args.users)]
+        conn.commit()
+
+    try:
+        def place(_):
+            return buy_stock(random.choice(user_ids), SYMBOL, random.randint(1, 20))["success"]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            results = list(executor.map(place, range(args.orders)))
+        elapsed = time.perf_counter() - start
+
+        with DBCore.get_connection() as conn:
+            with conn.cursor() as cur:
+                inconsistent = check_balances(cur, user_ids)
+
+        print_table(["threads", "users", "orders", "filled", "rejected", "orders_per_sec", "inconsistent_users"], [[
+            args.threads,
+            args.users,
+            args.orders,
+            results.count(True),
+            results.count(False),
+            int(args.orders / elapsed),
+            inconsistent
+        ]])
+
+    finally:
+        with DBCore.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(""" DELETE FROM users WHERE id = ANY(%s) """, (user_ids,))
+                cur.execute(""" DELETE FROM quotes WHERE symbol=%s """, (SYMBOL,))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+""" Compares the per-symbol (N+1) holdings aggregation with get_user_holdings, then the
+    GROUP BY aggregation of every lot with get_user_holdings' lookup of the holdings table
+    as the number of lots per symbol grows. Seeds synthetic positions inside a transaction
+    that is rolled back at the end, so no data is left behind.
+
+    Run with: python -m app.benchmarks.bench_holdings """
+
+from app.db_core import DBCore
+from app.position.position_repo import (
+    LOT_HOLDINGS_QUERY,
+    get_user_equity_symbols,
+    get_user_positions_of_equity,
+    get_user_holdings
+)
+from app.benchmarks.bench_utils import (
+    CountingCursor,
+    seed_user,
+    seed_positions,
+    time_call,
+    print_table
+)
+
+HOLDING_COUNTS = [1, 10, 50, 200, 1000]
+LOTS_PER_SYMBOL = 3
+
+# lots per symbol of a user holding LOT_GROWTH_SYMBOLS equities
+LOT_GROWTH = [1, 10, 100, 1000]
+LOT_GROWTH_SYMBOLS = 20
+
+
+def per_symbol_aggregation(cur, user_id):
+    """ The previous aggregation path: one query for the symbols, then one per symbol. """
+
+    holdings = {}
+    for symbol in get_user_equity_symbols(cur, user_id):
+        positions = get_user_positions_of_equity(cur, user_id, symbol)
+        holdings[symbol] = sum(p.number_of_shares for p in positions.positions)
+
+    return holdings
+
+
+def lot_aggregation(cur, user_id):
+    """ The previous grouped path: sums every lot of the user on each read. """
+
+    cur.execute(LOT_HOLDINGS_QUERY.format(where="WHERE user_id = %s"), (user_id,))
+    return cur.fetchall()
+
+
+def count_queries(fn):
+    """ Accepts a callable, runs it once and returns the number of statements it executed. """
+
+    CountingCursor.executed = 0
+    fn()
+    return CountingCursor.executed
+
+
+def main():
+    rows = []
+    growth_rows = []
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor(cursor_factory=CountingCursor) as cur:
+            try:
+                for holdings in HOLDING_COUNTS:
+                    user_id = seed_user(cur)
+                    seed_positions(cur, user_id, holdings, LOTS_PER_SYMBOL)
+
+                    old = lambda: per_symbol_aggregation(cur, user_id)
+                    new = lambda: get_user_holdings(cur, user_id)
+
+                    rows.append([
+                        holdings,
+                        count_queries(old),
+                        count_queries(new),
+                        f"{time_call(old):.2f}",
+                        f"{time_call(new):.2f}"
+                    ])
+
+                for lots in LOT_GROWTH:
+                    user_id = seed_user(cur)
+                    seed_positions(cur, user_id, LOT_GROWTH_SYMBOLS, lots)
+                    cur.execute(""" ANALYZE positions, holdings """)
+
+                    growth_rows.append([
+                        LOT_GROWTH_SYMBOLS * lots,
+                        f"{time_call(lambda: lot_aggregation(cur, user_id)):.2f}",
+                        f"{time_call(lambda: get_user_holdings(cur, user_id)):.2f}"
+                    ])
+            finally:
+                conn.rollback()
+
+    print_table(["holdings", "queries_n+1", "queries_holdings", "ms_n+1", "ms_holdings"], rows)
+    print()
+    print_table(["lots", "ms_lot_aggregation", "ms_holdings_table"], growth_rows)
+
+
+if __name__ == "__main__":
+    main()
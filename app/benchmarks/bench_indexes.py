@@ -0,0 +1,145 @@
+""" Seeds large synthetic users, positions, trades_log and transactions tables, then records
+    EXPLAIN ANALYZE plans and latencies of the hot queries without and with the indexes of
+    app/setup/migrations.py. Everything runs in one transaction that is rolled back at the
+    end, so neither the data nor index changes are kept. Dropping the indexes inside the
+    transaction locks the tables until it ends, so run it against a development database.
+
+    Run with: python -m app.benchmarks.bench_indexes [--users N] [--rows N] [--output FILE] """
+
+import argparse
+
+from app.db_core import DBCore
+from app.setup.migrations import MIGRATIONS, render
+from app.benchmarks.bench_utils import time_call, print_table
+
+# the hot queries of the repos, parameterised by a seeded user
+HOT_QUERIES = {
+    "positions by user, symbol": (
+        """ SELECT * FROM positions WHERE user_id=%(user_id)s AND symbol=%(symbol)s
+            ORDER BY position_id ASC """),
+    "holdings by user": (
+        """ SELECT symbol, SUM(number_of_shares) FROM positions WHERE user_id=%(user_id)s
+            GROUP BY symbol """),
+    "held symbols": (
+        """ SELECT DISTINCT symbol FROM positions """),
+    "trades by user, date": (
+        """ SELECT * FROM trades_log WHERE user_id=%(user_id)s ORDER BY date DESC """),
+    "transactions by user, date": (
+        """ SELECT * FROM transactions WHERE user_id=%(user_id)s
+            AND timestamp >= now() - interval '30 days' ORDER BY timestamp DESC """),
+    "user by email": (
+        """ SELECT * FROM users WHERE lower(email)=lower(%(email)s) """)
+}
+
+
+def seed_tables(cur, users, rows):
+    """ Accepts a cursor, number of users and number of rows per table, inserts synthetic data
+        and returns parameters of a user in the middle of the seeded range. """
+
+    cur.execute("""
+        WITH seeded AS (
+            INSERT INTO users (first_name, last_name, dob, email, password_hash, cash_balance, total_balance)
+            SELECT 'bench', 'user', '2000-01-01', 'bench_index_' || g || '@example.com', 'x', 100000, 100000
+            FROM generate_series(1, %s) AS g
+            RETURNING id
+        )
+        SELECT MIN(id), MAX(id) FROM seeded
+    """, (users,))
+    first_id, last_id = cur.fetchone()
+
+    cur.execute("""
+        INSERT INTO positions (user_id, company_name, symbol, number_of_shares,
+        average_price_per_share, last_price_per_share, position_total)
+        SELECT %(first)s + g %% %(users)s, 'bench co', 's' || g %% 500, 10, 100.00, 110.00, 1100.00
+        FROM generate_series(1, %(rows)s) AS g
+    """, {"first": first_id, "users": users, "rows": rows})
+
+    cur.execute("""
+        INSERT INTO trades_log (user_id, company_name, symbol, date, price_per_share,
+        number_of_shares, trade_total, trade_type)
+        SELECT %(first)s + g %% %(users)s, 'bench co', 's' || g %% 500,
+               now() - (g %% 100000) * interval '1 minute', 100.00, 10, 1000.00, 'BUY'
+        FROM generate_series(1, %(rows)s) AS g
+    """, {"first": first_id, "users": users, "rows": rows})
+
+    cur.execute("""
+        INSERT INTO transactions (user_id, amount, transaction_type, timestamp)
+        SELECT %(first)s + g %% %(users)s, 100.00, 'DEPOSIT', now() - (g %% 100000) * interval '1 hour'
+        FROM generate_series(1, %(rows)s) AS g
+    """, {"first": first_id, "users": users, "rows": rows})
+
+    cur.execute(""" ANALYZE users, positions, trades_log, transactions """)
+
+    user_id = (first_id + last_id) // 2
+    return {"user_id": user_id, "symbol": "s1", "email": f"BENCH_INDEX_{user_id - first_id}@example.com"}
+
+
+def measure(cur, params):
+    """ Accepts a cursor and query parameters, returns a dictionary of query names to their
+        best latency in milliseconds and EXPLAIN ANALYZE plan. """
+
+    results = {}
+
+    for name, query in HOT_QUERIES.items():
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+        plan = "\n".join(line for (line,) in cur.fetchall())
+
+        def run():
+            cur.execute(query, params)
+            cur.fetchall()
+
+        results[name] = (time_call(run), plan)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hot queries without and with indexes.")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--rows", type=int, default=500000, help="rows seeded per table")
+    parser.add_argument("--output", default=None, help="file to write the EXPLAIN plans to")
+    args = parser.parse_args()
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor() as cur:
+            try:
+                params = seed_tables(cur, args.users, args.rows)
+
+                # measure without the migration indexes
+                for migration in MIGRATIONS:
+                    for statement in migration.down:
+                        cur.execute(statement)
+                before = measure(cur, params)
+
+                # measure with the migration indexes
+                for migration in MIGRATIONS:
+                    for statement in migration.up:
+                        cur.execute(render(statement, False))
+                cur.execute(""" ANALYZE users, positions, trades_log, transactions """)
+                after = measure(cur, params)
+
+            finally:
+                conn.rollback()
+
+    rows = []
+    for name in HOT_QUERIES:
+        rows.append([name, f"{before[name][0]:.2f}", f"{after[name][0]:.2f}",
+                     f"{before[name][0] / after[name][0]:.1f}x"])
+    print_table(["query", "ms_before", "ms_after", "speedup"], rows)
+
+    report = []
+    for name in HOT_QUERIES:
+        report.append(f"== {name} (before) ==\n{before[name][1]}\n")
+        report.append(f"== {name} (after) ==\n{after[name][1]}\n")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write("\n".join(report))
+        print(f"Plans written to {args.output}")
+    else:
+        print()
+        print("\n".join(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+""" Measures how many quotes per second the offline SyntheticProvider serves for every
+    symbol in ALL_SYMBOLS, directly and through the quote cache. Needs no network or database.
+
+    Run with: python -m app.benchmarks.bench_market_data """
+
+import time
+
+from app.exchange_data.symbol_index import ALL_SYMBOLS
+from app.stock.market_data_provider import SyntheticProvider, set_provider
+from app.stock.stock_service import QUOTE_CACHE, create_stock, live_stock_price
+from app.benchmarks.bench_utils import print_table
+
+ROUNDS = 5
+
+
+def quotes_per_second(fn, symbols, rounds=ROUNDS):
+    """ Accepts a single-symbol quote function and a list of symbols, returns the number of
+        quotes served per second over rounds passes of the list. """
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for symbol in symbols:
+            fn(symbol)
+    elapsed = time.perf_counter() - start
+
+    return int(rounds * len(symbols) / elapsed)
+
+
+def main():
+    symbols = sorted(ALL_SYMBOLS)
+    provider = SyntheticProvider(tick_seconds=0.01)
+    set_provider(provider)
+    QUOTE_CACHE.clear()
+
+    rows = [
+        ["provider.get_price", len(symbols), quotes_per_second(provider.get_price, symbols)],
+        ["provider.get_stock", len(symbols), quotes_per_second(provider.get_stock, symbols)],
+        ["live_stock_price (cached)", len(symbols), quotes_per_second(live_stock_price, symbols)],
+        ["create_stock (cached)", len(symbols), quotes_per_second(create_stock, symbols)]
+    ]
+
+    print_table(["path", "symbols", "quotes_per_sec"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+""" Places a mix of buy and sell orders and deposits from many threads to measure orders per
+    second under per-user serialization and to check that balances stay consistent. Each
+    user's cash must equal their starting cash plus deposits and sales less purchases, their
+    held shares must equal shares bought less shares sold, and neither may go negative. Run
+    it with one user for full contention and with as many users as threads to see orders of
+    different users proceed in parallel. Prices come from the offline SyntheticProvider and
+    the seeded users are deleted at the end.
+
+    Run with: python -m app.benchmarks.bench_order_contention [--threads N] [--orders N] [--users N] """
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.db_core import DBCore
+from app.stock.market_data_provider import SyntheticProvider, set_provider
+from app.stock.stock_service import QUOTE_CACHE
+from app.trade.trade_service import buy_stock, sell_stock
+from app.user.user_service import deposit_user_funds
+from app.benchmarks.bench_utils import seed_user, print_table
+
+SYMBOL = "bnch"
+STARTING_CASH = 20000.00
+
+
+def check_users(cur, user_ids):
+    """ Accepts a cursor and list of user ids, returns the number of users whose cash balance
+        or held shares disagree with their trades and deposits, or are negative. """
+
+    cur.execute("""
+        SELECT u.id, u.cash_balance,
+               COALESCE((SELECT SUM(CASE WHEN t.trade_type = 'BUY' THEN -t.trade_total ELSE t.trade_total END)
+                         FROM trades_log t WHERE t.user_id = u.id), 0),
+               COALESCE((SELECT SUM(CASE WHEN t.trade_type = 'BUY' THEN t.number_of_shares ELSE -t.number_of_shares END)
+                         FROM trades_log t WHERE t.user_id = u.id), 0),
+               COALESCE((SELECT SUM(x.amount) FROM transactions x
+                         WHERE x.user_id = u.id AND x.transaction_type = 'DEPOSIT'), 0),
+               COALESCE((SELECT SUM(p.number_of_shares) FROM positions p WHERE p.user_id = u.id), 0)
+        FROM users u
+        WHERE u.id = ANY(%s)
+    """, (user_ids,))
+
+    inconsistent = 0
+    for user_id, cash_balance, traded, net_shares, deposited, held in cur.fetchall():
+        expected_cash = STARTING_CASH + float(traded) + float(deposited)
+        if (cash_balance < 0 or held < 0 or held != net_shares
+                or abs(float(cash_balance) - expected_cash) > 0.01):
+            inconsistent += 1
+    return inconsistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark contended orders of a few users.")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=1, help="fewer users means more contention")
+    args = parser.parse_args()
+
+    set_provider(SyntheticProvider())
+    QUOTE_CACHE.clear()
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor() as cur:
+            user_ids = [seed_user(cur, STARTING_CASH) for _ in range(args.users)]
+        conn.commit()
+
+    try:
+        def place(_):
+            user_id = random.choice(user_ids)
+            roll = random.random()
+
+            if roll < 0.5:
+                return "buy", buy_stock(user_id, SYMBOL, random.randint(1, 10))["success"]
+            if roll < 0.9:
+                return "sell", sell_stock(user_id, SYMBOL, random.randint(1, 10))["success"]
+            return "deposit", deposit_user_funds(user_id, 100.00)["success"]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            results = list(executor.map(place, range(args.orders)))
+        elapsed = time.perf_counter() - start
+
+        with DBCore.get_connection() as conn:
+            with conn.cursor() as cur:
+                inconsistent = check_users(cur, user_ids)
+
+        rows = []
+        for kind in ("buy", "sell", "deposit"):
+            outcomes = [success for placed, success in results if placed == kind]
+            rows.append([kind, len(outcomes), outcomes.count(True), outcomes.count(False)])
+        print_table(["order", "placed", "filled", "rejected"], rows)
+        print()
+        print_table(["threads", "users", "orders", "orders_per_sec", "inconsistent_users"], [[
+            args.threads,
+            args.users,
+            args.orders,
+            int(args.orders / elapsed),
+            inconsistent
+        ]])
+
+    finally:
+        with DBCore.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(""" DELETE FROM users WHERE id = ANY(%s) """, (user_ids,))
+                cur.execute(""" DELETE FROM quotes WHERE symbol=%s """, (SYMBOL,))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
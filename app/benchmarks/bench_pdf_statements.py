@@ -0,0 +1,80 @@
+""" Renders trade statements of synthetic trades with the classic NumberedCanvas, which keeps
+    every page until the document is saved, and with the low-memory mode, which streams rows
+    into lazily built tables and writes each page as it ends. Reports render time and peak
+    RSS of each. Every render runs in a fresh interpreter so peaks do not carry over, and
+    no database is needed.
+
+    Run with: python -m app.benchmarks.bench_pdf_statements [--sizes 1000 10000 100000] """
+
+import argparse
+import subprocess
+import sys
+
+from app.benchmarks.bench_utils import print_table
+
+# prints elapsed milliseconds, peak RSS before rendering and peak RSS after, in kilobytes
+TEMPLATE = """
+import os, resource, time
+from datetime import datetime, timedelta
+from app.pdf_generator import generate_trade_statement
+from app.stock.stock_model import Stock
+from app.trade.trade_model import Trade
+from app.user.user_model import User
+
+rows = {rows}
+low_memory = {low_memory}
+user = User("bench", "user", "2000-01-01", "bench@example.com", id=0)
+start_date = datetime(2020, 1, 1)
+
+def trades():
+    for i in range(rows):
+        stock = Stock(company_name="bench co", symbol="b" + str(i % 500), price=100 + i % 50)
+        yield Trade(user_id=0, stock=stock, number_of_shares=10, trade_type="BUY",
+                    trade_id=i + 1, timestamp=start_date + timedelta(minutes=i))
+
+source = trades() if low_memory else list(trades())
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+start = time.perf_counter()
+path = generate_trade_statement(0, source, filename="bench_{mode}_{rows}.pdf", user=user, low_memory=low_memory)
+elapsed = (time.perf_counter() - start) * 1000
+
+print(elapsed, before, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, os.path.getsize(path))
+os.remove(path)
+"""
+
+
+def render(rows, low_memory):
+    """ Renders a statement of rows trades in a fresh interpreter, returns its elapsed
+        milliseconds, peak RSS before and after rendering in kilobytes and file size. """
+
+    mode = "low_memory" if low_memory else "classic"
+    code = TEMPLATE.format(rows=rows, low_memory=low_memory, mode=mode)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    elapsed, before, after, size = output.stdout.split()[-4:]
+    return float(elapsed), int(before), int(after), int(size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF statement memory and render time.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes:
+        for low_memory in (False, True):
+            elapsed, before, after, file_size = render(size, low_memory)
+            rows.append([
+                size,
+                "low-memory" if low_memory else "classic",
+                f"{elapsed / 1000:.2f}",
+                f"{after / 1024:.1f}",
+                f"{(after - before) / 1024:.1f}",
+                f"{file_size / 1024:.0f}"
+            ])
+
+    print_table(["rows", "mode", "render_s", "peak_rss_mb", "render_rss_mb", "file_kb"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+""" Compares portfolio page views that write live prices back to every lot before reading
+    holdings, as get_portfolio used to through update_positions_in_table, with read-time
+    valuation against the quotes table, which writes nothing. Reports latency and WAL bytes
+    per view, measured from pg_current_wal_insert_lsn, and the cost of one batched
+    refresh_position_prices pass over the same lots. Seeds synthetic lots and quotes inside
+    a transaction that is rolled back at the end.
+
+    Run with: python -m app.benchmarks.bench_read_time_valuation [--views N] """
+
+import argparse
+import time
+
+from app.db_core import DBCore
+from app.position.position_repo import (
+    get_all_user_positions,
+    get_user_holdings,
+    refresh_position_prices,
+    update_list_of_positions
+)
+from app.benchmarks.bench_utils import seed_user, seed_positions, print_table
+
+LOT_COUNTS = [10, 100, 1000, 5000]
+LOTS_PER_SYMBOL = 5
+
+
+def write_on_read(cur, user_id, price):
+    """ The previous view path: reprice and rewrite every lot, then read the holdings. """
+
+    positions = get_all_user_positions(cur, user_id)
+    for p in positions:
+        p.last_price_per_share = price
+        p.total_value = p.number_of_shares * price
+    update_list_of_positions(cur, positions)
+
+    return get_user_holdings(cur, user_id)
+
+
+def wal_position(cur):
+    cur.execute(""" SELECT pg_current_wal_insert_lsn() """)
+    return cur.fetchone()[0]
+
+
+def measure(cur, fn, runs):
+    """ Accepts a cursor, a callable taking the run number and a number of runs. Returns the
+        mean milliseconds and WAL bytes per run. """
+
+    start_lsn = wal_position(cur)
+    start = time.perf_counter()
+    for run in range(runs):
+        fn(run)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    cur.execute(""" SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), %s) """, (start_lsn,))
+    wal_bytes = int(cur.fetchone()[0])
+
+    return elapsed / runs, wal_bytes / runs
+
+
+def refresh_pass(cur):
+    """ Runs refresh_position_prices over every lot in one batch. """
+
+    return refresh_position_prices(cur, 0, 1000000)[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark write-on-read against read-time valuation.")
+    parser.add_argument("--views", type=int, default=20, help="page views measured per lot count")
+    args = parser.parse_args()
+
+    views = []
+    refreshes = []
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor() as cur:
+            try:
+                for lots in LOT_COUNTS:
+                    user_id = seed_user(cur)
+                    seed_positions(cur, user_id, max(1, lots // LOTS_PER_SYMBOL), LOTS_PER_SYMBOL)
+                    cur.execute("""
+                        INSERT INTO quotes (symbol, price, as_of)
+                        SELECT DISTINCT symbol, 120.00, CURRENT_TIMESTAMP FROM positions WHERE user_id = %s
+                        ON CONFLICT (symbol) DO UPDATE SET price = EXCLUDED.price, as_of = EXCLUDED.as_of
+                    """, (user_id,))
+
+                    # prices move between views, as live prices would
+                    old_ms, old_wal = measure(cur, lambda run: write_on_read(cur, user_id, 100 + run % 7), args.views)
+                    new_ms, new_wal = measure(cur, lambda run: get_user_holdings(cur, user_id), args.views)
+
+                    views.append([
+                        lots,
+                        f"{old_ms:.2f}",
+                        f"{new_ms:.2f}",
+                        f"{old_wal / 1024:.1f}",
+                        f"{new_wal / 1024:.1f}"
+                    ])
+
+                    # one refresh after the quotes moved, then one with nothing left to change
+                    cur.execute(""" UPDATE quotes SET price = price + 1 WHERE symbol IN
+                                    (SELECT symbol FROM positions WHERE user_id = %s) """, (user_id,))
+                    changed = []
+                    moved_ms, moved_wal = measure(cur, lambda run: changed.append(refresh_pass(cur)), 1)
+                    still_ms, still_wal = measure(cur, lambda run: changed.append(refresh_pass(cur)), 1)
+
+                    refreshes.append([
+                        lots,
+                        changed[0],
+                        f"{moved_ms:.2f}",
+                        f"{moved_wal / 1024:.1f}",
+                        changed[1],
+                        f"{still_ms:.2f}",
+                        f"{still_wal / 1024:.1f}"
+                    ])
+
+                    # keep later lot counts from rewriting this user's lots
+                    cur.execute(""" DELETE FROM positions WHERE user_id = %s """, (user_id,))
+            finally:
+                conn.rollback()
+
+    print_table(["lots", "ms_write_on_read", "ms_read_time", "wal_kb_write_on_read", "wal_kb_read_time"], views)
+    print()
+    print_table(["lots", "refreshed", "ms_refresh", "wal_kb_refresh",
+                 "unchanged_refreshed", "ms_unchanged", "wal_kb_unchanged"], refreshes)
+
+
+if __name__ == "__main__":
+    main()
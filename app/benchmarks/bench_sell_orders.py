@@ -0,0 +1,96 @@
+""" Compares selling across many lots with the previous Python FIFO loop (one trade insert
+    plus one close or update per lot) against the single server-side statement of
+    execute_sell. Seeds synthetic lots inside a transaction that is rolled back at the end.
+
+    Run with: python -m app.benchmarks.bench_sell_orders """
+
+import time
+
+from app.db_core import DBCore
+from app.stock.stock_model import Stock
+from app.trade.trade_model import Trade
+from app.trade.trade_repo import log_trade, execute_sell
+from app.position.position_repo import (
+    get_user_positions_of_equity,
+    close_position,
+    update_position,
+    update_positions_last_price
+)
+from app.user.user_repo import get_user_by_id, update_user_cash_balance
+from app.benchmarks.bench_utils import (
+    CountingCursor,
+    seed_user,
+    seed_positions,
+    print_table
+)
+
+# seeded lots hold 10 shares each, every sell spans all but half of the last lot
+LOT_COUNTS = [1, 10, 100, 500, 2000]
+SHARES_PER_LOT = 10
+
+
+def sell_with_loop(cur, user_id, stock, number_of_shares):
+    """ The previous sell path: walks the lots in Python issuing statements per lot. """
+
+    positions = get_user_positions_of_equity(cur, user_id, stock.symbol)
+    total_value_shares_sold = 0
+    position_number = 0
+
+    while number_of_shares > 0:
+        position = positions.positions[position_number]
+        shares = min(number_of_shares, position.number_of_shares)
+        trade = Trade(user_id, stock, shares, "SELL")
+        log_trade(cur, trade)
+
+        if shares == position.number_of_shares:
+            close_position(cur, position)
+        else:
+            position.number_of_shares -= shares
+            position.total_value = position.number_of_shares * stock.price
+            position.last_price_per_share = stock.price
+            update_position(cur, position)
+
+        number_of_shares -= shares
+        total_value_shares_sold += trade.trade_total
+        position_number += 1
+
+    user = get_user_by_id(cur, user_id)
+    update_user_cash_balance(cur, user_id, float(user.cash_balance) + total_value_shares_sold)
+    update_positions_last_price(cur, user_id, stock.symbol, stock.price)
+
+
+def timed_sell(cur, lots, sell):
+    """ Seeds a user with lots of one symbol, runs sell across nearly all of them and returns
+        the statements executed and elapsed milliseconds. """
+
+    user_id = seed_user(cur)
+    seed_positions(cur, user_id, num_symbols=1, lots_per_symbol=lots)
+    stock = Stock("bench co 1", "b1", 120.00)
+    number_of_shares = lots * SHARES_PER_LOT - SHARES_PER_LOT // 2
+
+    CountingCursor.executed = 0
+    start = time.perf_counter()
+    sell(cur, user_id, stock, number_of_shares)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    return CountingCursor.executed, elapsed
+
+
+def main():
+    rows = []
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor(cursor_factory=CountingCursor) as cur:
+            try:
+                for lots in LOT_COUNTS:
+                    loop_statements, loop_ms = timed_sell(cur, lots, sell_with_loop)
+                    fifo_statements, fifo_ms = timed_sell(cur, lots, execute_sell)
+                    rows.append([lots, loop_statements, fifo_statements, f"{loop_ms:.2f}", f"{fifo_ms:.2f}"])
+            finally:
+                conn.rollback()
+
+    print_table(["lots", "stmts_loop", "stmts_fifo", "ms_loop", "ms_fifo"], rows)
+
+
+if __name__ == "__main__":
+    main()
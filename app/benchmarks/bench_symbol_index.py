@@ -0,0 +1,68 @@
+""" Compares worker startup cost of parsing the exchange listings with pandas against
+    loading the compiled, memory-mapped symbol index, and the cost of a lookup in each.
+    Every measurement runs in a fresh interpreter so import costs are included.
+
+    Run with: python -m app.benchmarks.bench_symbol_index """
+
+import subprocess
+import sys
+
+from app.exchange_data.symbol_index import compile_symbol_index
+from app.benchmarks.bench_utils import print_table
+
+RUNS = 5
+
+# each snippet prints its elapsed milliseconds and peak RSS in kilobytes
+SNIPPETS = {
+    "pandas csv parse": """
+from app.exchange_data.exchange_service import get_all_symbols
+symbols = get_all_symbols()
+found = "AAPL" in symbols
+""",
+    "compiled index": """
+from app.exchange_data.symbol_index import ALL_SYMBOLS
+symbols = ALL_SYMBOLS
+found = "AAPL" in symbols
+"""
+}
+
+TEMPLATE = """
+import resource, time
+start = time.perf_counter()
+{snippet}
+startup = (time.perf_counter() - start) * 1000
+start = time.perf_counter()
+for _ in range(100000):
+    "AAPL" in symbols
+lookup = (time.perf_counter() - start) * 10
+print(startup, lookup, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def run_snippet(snippet):
+    """ Runs a snippet in a fresh interpreter, returns its startup ms, lookup µs and peak RSS. """
+
+    output = subprocess.run([sys.executable, "-c", TEMPLATE.format(snippet=snippet)],
+                            capture_output=True, text=True, check=True).stdout
+    startup, lookup, rss = output.split()
+    return float(startup), float(lookup), int(rss)
+
+
+def main():
+    compile_symbol_index()
+    rows = []
+
+    for name, snippet in SNIPPETS.items():
+        results = [run_snippet(snippet) for _ in range(RUNS)]
+        rows.append([
+            name,
+            f"{min(r[0] for r in results):.1f}",
+            f"{min(r[1] for r in results):.3f}",
+            min(r[2] for r in results)
+        ])
+
+    print_table(["loader", "startup_ms", "lookup_us", "peak_rss_kb"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+""" Compares refreshing a user's lots with one UPDATE per lot against the single set-based
+    UPDATE ... FROM VALUES of update_list_of_positions. Seeds synthetic lots inside a
+    transaction that is rolled back at the end.
+
+    Run with: python -m app.benchmarks.bench_update_positions """
+
+from app.db_core import DBCore
+from app.position.position_repo import get_all_user_positions, update_list_of_positions
+from app.benchmarks.bench_utils import (
+    CountingCursor,
+    seed_user,
+    seed_positions,
+    time_call,
+    print_table
+)
+
+LOT_COUNTS = [10, 100, 1000, 5000]
+
+
+def update_per_lot(cur, positions):
+    """ The previous update path: one UPDATE statement per lot. """
+
+    for p in positions:
+        cur.execute(""" UPDATE positions SET number_of_shares=%s, last_price_per_share=%s,
+            position_total=%s WHERE position_id=%s """, (
+            p.number_of_shares, p.last_price_per_share, p.total_value, p.position_id
+        ))
+
+
+def reprice(positions, price):
+    """ Sets a new last price on every position object. """
+
+    for p in positions:
+        p.last_price_per_share = price
+        p.total_value = p.number_of_shares * price
+
+
+def main():
+    rows = []
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor(cursor_factory=CountingCursor) as cur:
+            try:
+                for lots in LOT_COUNTS:
+                    user_id = seed_user(cur)
+                    seed_positions(cur, user_id, num_symbols=lots)
+                    positions = get_all_user_positions(cur, user_id)
+                    reprice(positions, 123.45)
+
+                    CountingCursor.executed = 0
+                    update_per_lot(cur, positions)
+                    loop_statements = CountingCursor.executed
+
+                    CountingCursor.executed = 0
+                    updated = update_list_of_positions(cur, positions)
+                    bulk_statements = CountingCursor.executed
+
+                    rows.append([
+                        lots,
+                        loop_statements,
+                        bulk_statements,
+                        f"{updated}/{len(positions)}",
+                        f"{time_call(lambda: update_per_lot(cur, positions), repeat=3):.2f}",
+                        f"{time_call(lambda: update_list_of_positions(cur, positions), repeat=3):.2f}"
+                    ])
+            finally:
+                conn.rollback()
+
+    print_table(["lots", "stmts_loop", "stmts_bulk", "bulk_updated", "ms_loop", "ms_bulk"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import time
+from psycopg2.extensions import cursor as base_cursor
+
+from app.position.position_repo import rebuild_holdings
+
+
+class CountingCursor(base_cursor):
+    """ psycopg2 cursor that counts the statements it executes. """
+
+    executed = 0
+
+    def execute(self, query, vars=None):
+        CountingCursor.executed += 1
+        return super().execute(query, vars)
+
+
+def seed_user(cur, cash_balance=1000000.00):
+    """ Accepts a cursor, inserts a throwaway benchmark user and returns its id. """
+
+    cur.execute("""
+        INSERT INTO users (first_name, last_name, dob, email, password_hash, cash_balance, total_balance)
+        VALUES ('bench', 'user', '2000-01-01', 'bench_' || md5(random()::text) || '@example.com', 'x', %s, %s)
+        RETURNING id
+    """, (cash_balance, cash_balance))
+
+    return cur.fetchone()[0]
+
+
+def seed_positions(cur, user_id, num_symbols, lots_per_symbol=1):
+    """ Accepts a cursor, user_id, number of symbols and lots per symbol, inserts synthetic
+        positions for the user in a single statement and rebuilds the user's holdings. """
+
+    cur.execute("""
+        INSERT INTO positions (user_id, company_name, symbol, number_of_shares,
+        average_price_per_share, last_price_per_share, position_total)
+        SELECT %s, 'bench co ' || s, 'b' || s, 10, 100.00, 110.00, 1100.00
+        FROM generate_series(1, %s) AS s, generate_series(1, %s) AS l
+    """, (user_id, num_symbols, lots_per_symbol))
+
+    rebuild_holdings(cur, user_id)
+
+
+def time_call(fn, repeat=5):
+    """ Accepts a callable, runs it repeat times and returns the best time in milliseconds. """
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def print_table(headers, rows):
+    """ Prints rows of values as an aligned plain text table. """
+
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(v).rjust(w) for v, w in zip(row, widths)))
@@ -0,0 +1,70 @@
+""" Compares valuing a user's lots by walking Position objects in Python, converting each
+    Decimal to float, with the NumPy valuation engine. Both compute market value, unrealized
+    P&L and weight per holding and the user's totals. Reports the time to load the lots
+    and to value them at 10, 1k and 100k lots. Seeds synthetic lots inside a transaction
+    that is rolled back at the end.
+
+    Run with: python -m app.benchmarks.bench_valuation_engine """
+
+from app.db_core import DBCore
+from app.portfolio.valuation_engine import value_lots
+from app.position.position_repo import get_all_user_positions, get_lots
+from app.benchmarks.bench_utils import seed_user, seed_positions, time_call, print_table
+
+LOT_COUNTS = [10, 1000, 100000]
+MAX_SYMBOLS = 500
+
+
+def value_positions(positions, prices):
+    """ The object path: sums Position objects per symbol in Python. """
+
+    holdings = {}
+    for p in positions:
+        price = prices.get(p.symbol, float(p.last_price_per_share))
+        shares, cost, value = holdings.get(p.symbol, (0, 0.0, 0.0))
+        holdings[p.symbol] = (shares + p.number_of_shares,
+                              cost + p.number_of_shares * float(p.price_per_share),
+                              value + p.number_of_shares * price)
+
+    total_value = sum(value for shares, cost, value in holdings.values())
+    total_cost = sum(cost for shares, cost, value in holdings.values())
+    weights = {symbol: value / total_value for symbol, (shares, cost, value) in holdings.items()}
+
+    return holdings, weights, total_value, total_value - total_cost
+
+
+def main():
+    rows = []
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor() as cur:
+            try:
+                for lots in LOT_COUNTS:
+                    user_id = seed_user(cur)
+                    symbols = min(lots, MAX_SYMBOLS)
+                    seed_positions(cur, user_id, symbols, lots // symbols)
+
+                    prices = {f"b{s}": 120.0 for s in range(1, symbols + 1)}
+                    positions = get_all_user_positions(cur, user_id)
+                    lot_arrays = get_lots(cur, user_id)
+
+                    # both paths must agree on the totals
+                    _, _, object_value, object_pnl = value_positions(positions, prices)
+                    engine_value, _, engine_pnl = value_lots(lot_arrays, prices).user_totals(user_id)
+                    assert abs(object_value - engine_value) < 0.01 and abs(object_pnl - engine_pnl) < 0.01
+
+                    rows.append([
+                        lots,
+                        f"{time_call(lambda: get_all_user_positions(cur, user_id), repeat=3):.2f}",
+                        f"{time_call(lambda: get_lots(cur, user_id), repeat=3):.2f}",
+                        f"{time_call(lambda: value_positions(positions, prices)):.3f}",
+                        f"{time_call(lambda: value_lots(lot_arrays, prices)):.3f}"
+                    ])
+            finally:
+                conn.rollback()
+
+    print_table(["lots", "ms_load_objects", "ms_load_arrays", "ms_value_objects", "ms_value_numpy"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 import psycopg2
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from flask import g, has_app_context
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
 
 # load database
 load_dotenv()
@@ -10,17 +14,323 @@ DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 
-class DBCore:
-    """ Class for connecting to the database. """
-    
-    @staticmethod
-    def get_connection():
-        """ Returns a psycopg2 database connection. """
-        
+# connection pool settings
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_HEALTH_CHECK_AFTER = float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30"))
+
+
+class PoolTimeoutError(Exception):
+    """ Raised when no pooled connection becomes available within the checkout timeout. """
+
+
+class ConnectionPool:
+    """ Thread-safe pool of psycopg2 connections. Connections are created lazily up to
+        max_size, checked for health on checkout and reused between callers. """
+
+    def __init__(self, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+                 timeout=DB_POOL_TIMEOUT, health_check_after=DB_POOL_HEALTH_CHECK_AFTER):
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+
+        # idle connections as (connection, time returned to pool) pairs
+        self._idle = []
+        self._size = 0
+        self._condition = threading.Condition()
+        self._pid = os.getpid()
+
+        self._stats = {
+            "connections_created": 0,
+            "connections_discarded": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0
+        }
+
+    def _connect(self):
+        """ Opens a brand-new psycopg2 connection. """
+
+        with self._condition:
+            self._stats["connections_created"] += 1
+
         return psycopg2.connect(
                 host=DB_HOST,
                 port=DB_PORT,
                 database=DB_NAME,
                 user=DB_USER,
                 password=DB_PASSWORD
-            )
\ No newline at end of file
+            )
+
+    def _reset_after_fork(self):
+        """ Drops connections inherited from a parent process, sockets cannot be shared. """
+
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._size = 0
+            self._condition = threading.Condition()
+
+    def _is_healthy(self, conn, idle_since):
+        """ Accepts a connection and the time it was returned to the pool, returns true
+            if it is still usable. Connections idle for longer than health_check_after
+            are probed with a round trip. """
+
+        if conn.closed:
+            return False
+
+        if time.monotonic() - idle_since < self.health_check_after:
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        """ Closes a connection and frees its slot in the pool. Caller must hold the lock. """
+
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+        self._size -= 1
+        self._stats["connections_discarded"] += 1
+        self._condition.notify()
+
+    def fill(self):
+        """ Opens connections until the pool holds at least min_size of them. """
+
+        with self._condition:
+            self._reset_after_fork()
+            while self._size < self.min_size:
+                self._idle.append((self._connect(), time.monotonic()))
+                self._size += 1
+            self._condition.notify_all()
+
+    def checkout(self, timeout=None):
+        """ Returns a healthy connection from the pool, opening a new one if the pool
+            is below max_size. Blocks for up to timeout seconds when the pool is exhausted. """
+
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited_from = None
+
+        while True:
+            conn = None
+
+            with self._condition:
+                self._reset_after_fork()
+
+                # wait until an idle connection or a free slot is available
+                while not self._idle and self._size >= self.max_size:
+                    if waited_from is None:
+                        waited_from = time.monotonic()
+                        self._stats["waits"] += 1
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        self._stats["wait_time"] += time.monotonic() - waited_from
+                        raise PoolTimeoutError(
+                            f"No database connection available within {timeout} seconds.")
+                    self._condition.wait(remaining)
+
+                # take an idle connection, or reserve a slot for a new one
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                else:
+                    self._size += 1
+
+            # open the new connection outside the lock
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+                self._record_checkout(waited_from)
+                return conn
+
+            # health check the idle connection outside the lock
+            if self._is_healthy(conn, idle_since):
+                self._record_checkout(waited_from)
+                return conn
+
+            with self._condition:
+                self._discard(conn)
+
+    def _record_checkout(self, waited_from):
+        """ Updates checkout counters. """
+
+        with self._condition:
+            self._stats["checkouts"] += 1
+            if waited_from is not None:
+                self._stats["wait_time"] += time.monotonic() - waited_from
+
+    def release(self, conn):
+        """ Returns a connection to the pool. Any open transaction is rolled back and
+            broken connections are discarded. """
+
+        # connections inherited from a parent process are never reused
+        if self._pid != os.getpid():
+            return
+
+        try:
+            if not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if not conn.closed and conn.autocommit:
+                conn.autocommit = False
+        except psycopg2.Error:
+            pass
+
+        with self._condition:
+            if conn.closed:
+                self._discard(conn)
+                return
+
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    def close_all(self):
+        """ Closes every idle connection held by the pool. """
+
+        with self._condition:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+
+    def stats(self):
+        """ Returns a dict of pool counters and current sizes. """
+
+        with self._condition:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["max_size"] = self.max_size
+            return stats
+
+
+class PooledConnection:
+    """ Wraps a pooled psycopg2 connection. Used as a context manager it behaves like a
+        psycopg2 connection (commit on success, rollback on error) and then hands the
+        connection back to the pool. Request-scoped connections are only handed back
+        when the Flask request ends, and nested blocks share the outer transaction. """
+
+    def __init__(self, pool, conn, request_scoped=False):
+        self._pool = pool
+        self._conn = conn
+        self._request_scoped = request_scoped
+        self._depth = 0
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        # settings such as autocommit belong to the underlying connection
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+    def commit(self):
+        if self._conn is not None:
+            self._conn.commit()
+
+    def rollback(self):
+        if self._conn is not None:
+            self._conn.rollback()
+
+    def __enter__(self):
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+
+        # only the outermost block ends the transaction
+        if self._depth > 0:
+            return False
+
+        try:
+            if not self._conn.closed:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            if not self._request_scoped:
+                self.close()
+
+        return False
+
+    def close(self):
+        """ Returns the underlying connection to the pool. """
+
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+            self._depth = 0
+
+
+class DBCore:
+    """ Class for connecting to the database. """
+
+    pool = ConnectionPool()
+
+    @staticmethod
+    def get_connection():
+        """ Returns a pooled psycopg2 database connection. Inside a Flask request every
+            call returns the same connection, which is released when the request ends. """
+
+        if not has_app_context():
+            return PooledConnection(DBCore.pool, DBCore.pool.checkout())
+
+        if "db_conn" not in g:
+            g.db_conn = PooledConnection(DBCore.pool, DBCore.pool.checkout(), request_scoped=True)
+
+        return g.db_conn
+
+    @staticmethod
+    def get_dedicated_connection():
+        """ Returns a pooled psycopg2 database connection that is not tied to the Flask
+            request, for work that outlives it such as a streamed response. Used as a
+            context manager it is released when the block ends. """
+
+        return PooledConnection(DBCore.pool, DBCore.pool.checkout())
+
+    @staticmethod
+    def release_request_connection(exception=None):
+        """ Returns the request-scoped connection to the pool. Registered as a Flask
+            teardown handler. """
+
+        conn = g.pop("db_conn", None)
+        if conn is not None:
+            conn.close()
+
+    @staticmethod
+    def warm_pool():
+        """ Opens DB_POOL_MIN_SIZE connections ahead of the first requests. Returns false if
+            the database could not be reached, the pool then connects on first use. """
+
+        try:
+            DBCore.pool.fill()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def pool_stats():
+        """ Returns checkout, wait and size counters of the connection pool. """
+
+        return DBCore.pool.stats()
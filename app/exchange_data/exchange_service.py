@@ -1,6 +1,11 @@
 import pandas as pd
 import os
 
+from app.exchange_data.symbol_index import (
+    ALL_SYMBOLS as SYMBOL_INDEX,
+    compile_symbol_index
+)
+
 # define where to save CSV files
 BASE_PATH = os.path.join(os.path.dirname(__file__), "exchange_data")
 os.makedirs(BASE_PATH, exist_ok=True)
@@ -18,22 +23,23 @@ OTHER_URL = "ftp://ftp.nasdaqtrader.com/SymbolDirectory/otherlisted.txt"
 
 # tested, functional, commented
 def get_nasdaq_tickers():
-    """ Generates a csv file containing symbols of companies trading on the NASDAQ exchange. """
+    """ Generates a csv file containing symbols and names of companies trading on the NASDAQ exchange. """
 
     # read csv file into a df
     df = pd.read_csv(NASDAQ_URL, sep="|")
 
-    # get the symbols
-    tickers_column = df[["Symbol"]]
+    # get the symbols and company names
+    df = df.rename(columns={"Security Name": "Name"})
+    tickers_column = df[["Symbol", "Name"]]
 
     # save to csv file
     save_path = os.path.join(BASE_PATH, "nasdaq.csv")
-    tickers_column.to_csv(save_path, index=False, header="Symbol")
+    tickers_column.to_csv(save_path, index=False)
 
 
 # tested, functional, commented
 def get_nyse_tickers():
-    """ Generates a csv file containing symbols of companies trading on the NYSE exchange. """
+    """ Generates a csv file containing symbols and names of companies trading on the NYSE exchange. """
 
     # read csv file into a df
     df = pd.read_csv(OTHER_URL, sep="|")
@@ -42,17 +48,17 @@ def get_nyse_tickers():
     nyse_df = df[df["Exchange"] == "N"]
 
     # rename column, refactor df
-    nyse_df = nyse_df.rename(columns={"ACT Symbol": "Symbol"})
-    tickers_column = nyse_df[["Symbol"]]
+    nyse_df = nyse_df.rename(columns={"ACT Symbol": "Symbol", "Security Name": "Name"})
+    tickers_column = nyse_df[["Symbol", "Name"]]
 
     # save to csv file
     save_path = os.path.join(BASE_PATH, "nyse.csv")
-    tickers_column.to_csv(save_path, index=False, header="Symbol")
+    tickers_column.to_csv(save_path, index=False)
 
 
 # tested, functional, commented
 def get_amex_tickers():
-    """ Generates a csv file containing symbols of companies trading on the AMEX exchange. """
+    """ Generates a csv file containing symbols and names of companies trading on the AMEX exchange. """
 
     # read csv file into a df
     df = pd.read_csv(OTHER_URL, sep="|")
@@ -61,12 +67,12 @@ def get_amex_tickers():
     amex_df = df[df["Exchange"] == "A"]
 
     # rename column, refactor df
-    amex_df = amex_df.rename(columns={"ACT Symbol": "Symbol"})
-    tickers_column = amex_df[["Symbol"]]
+    amex_df = amex_df.rename(columns={"ACT Symbol": "Symbol", "Security Name": "Name"})
+    tickers_column = amex_df[["Symbol", "Name"]]
 
     # save to csv file
     save_path = os.path.join(BASE_PATH, "amex.csv")
-    tickers_column.to_csv(save_path, index=False, header="Symbol")
+    tickers_column.to_csv(save_path, index=False)
 
 
 # tested, functional, commented
@@ -123,4 +129,19 @@ def get_all_symbols():
     return nasdaq | nyse | amex
 
 
-ALL_SYMBOLS = get_all_symbols()
\ No newline at end of file
+# tested, functional, commented
+def update_exchange_listings():
+    """ Downloads the latest NASDAQ, NYSE and AMEX listings and recompiles the symbol index. """
+
+    get_nasdaq_tickers()
+    get_nyse_tickers()
+    get_amex_tickers()
+    compile_symbol_index()
+
+
+# symbols are served from the compiled index, loaded lazily on first lookup
+ALL_SYMBOLS = SYMBOL_INDEX
+
+
+if __name__ == "__main__":
+    update_exchange_listings()
\ No newline at end of file
@@ -0,0 +1,206 @@
+import csv
+import mmap
+import os
+import struct
+import threading
+
+# get directory of THIS file
+CURRENT_DIR = os.path.dirname(__file__)
+
+# path to subfolder
+DATA_PATH = os.path.join(CURRENT_DIR, "exchange_data")
+
+# compiled index file
+INDEX_PATH = os.path.join(DATA_PATH, "symbols.idx")
+
+# exchange listing files and the one byte tag stored with each of their symbols
+EXCHANGE_FILES = {
+    b"Q": ("NASDAQ", "nasdaq.csv"),
+    b"N": ("NYSE", "nyse.csv"),
+    b"A": ("AMEX", "amex.csv")
+}
+
+# index layout: 8 byte magic, record count, record width, then fixed width records sorted
+# by symbol, each an ascii symbol null padded to SYMBOL_WIDTH bytes plus an exchange tag
+MAGIC = b"SYMIDX01"
+HEADER = struct.Struct("<8sII")
+SYMBOL_WIDTH = 11
+RECORD_WIDTH = SYMBOL_WIDTH + 1
+
+
+def read_listing_files(data_path=DATA_PATH):
+    """ Reads the exchange listing csv files, returns a dictionary with symbols as keys and
+        exchange tags as values. """
+
+    symbols = {}
+
+    for tag, (exchange, filename) in EXCHANGE_FILES.items():
+        with open(os.path.join(data_path, filename), newline="") as file:
+            for row in csv.DictReader(file):
+                symbol = (row.get("Symbol") or "").strip()
+
+                # skip blank rows and the listing's trailing file creation note
+                if not symbol or " " in symbol:
+                    continue
+
+                symbols.setdefault(symbol.upper(), tag)
+
+    return symbols
+
+
+def read_listing_names(data_path=DATA_PATH):
+    """ Reads the exchange listing csv files, returns a dictionary with symbols as keys and
+        company names as values. Listings saved without a Name column yield no names. """
+
+    names = {}
+
+    for tag, (exchange, filename) in EXCHANGE_FILES.items():
+        with open(os.path.join(data_path, filename), newline="") as file:
+            for row in csv.DictReader(file):
+                symbol = (row.get("Symbol") or "").strip()
+                name = (row.get("Name") or "").strip()
+
+                if symbol and name and " " not in symbol:
+                    names.setdefault(symbol.upper(), name)
+
+    return names
+
+
+def build_index_bytes(symbols):
+    """ Accepts a dictionary of symbols to exchange tags, returns the compiled index as bytes. """
+
+    records = []
+    for symbol in sorted(symbols):
+        encoded = symbol.encode("ascii")
+        if len(encoded) > SYMBOL_WIDTH:
+            continue
+        records.append(encoded.ljust(SYMBOL_WIDTH, b"\0") + symbols[symbol])
+
+    return HEADER.pack(MAGIC, len(records), RECORD_WIDTH) + b"".join(records)
+
+
+def compile_symbol_index(data_path=DATA_PATH, index_path=INDEX_PATH):
+    """ Compiles the exchange listing csv files into the binary symbol index. Run after
+        refreshing the listings: python -m app.exchange_data.symbol_index """
+
+    data = build_index_bytes(read_listing_files(data_path))
+
+    # write atomically so running workers never map a half written file
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, index_path)
+
+    return index_path
+
+
+def index_is_stale(index_path=INDEX_PATH, data_path=DATA_PATH):
+    """ Returns true if the index file is missing or older than any exchange listing file. """
+
+    if not os.path.exists(index_path):
+        return True
+
+    index_mtime = os.path.getmtime(index_path)
+    for exchange, filename in EXCHANGE_FILES.values():
+        if os.path.getmtime(os.path.join(data_path, filename)) > index_mtime:
+            return True
+
+    return False
+
+
+class SymbolIndex:
+    """ Read-only set of every listed symbol, backed by the compiled index file. The file is
+        memory-mapped on first lookup, so forked workers share its pages, and lookups are
+        binary searches over the sorted records. """
+
+    def __init__(self, index_path=INDEX_PATH):
+        self.index_path = index_path
+        self._data = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """ Maps the index file, compiling it first if it does not exist yet. """
+
+        with self._lock:
+            if self._data is not None:
+                return self._data
+
+            try:
+                if index_is_stale(self.index_path):
+                    compile_symbol_index(index_path=self.index_path)
+
+                with open(self.index_path, "rb") as file:
+                    data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            # fall back to an in-memory index if the file cannot be written or mapped
+            except OSError:
+                data = build_index_bytes(read_listing_files())
+
+            magic, count, width = HEADER.unpack_from(data, 0)
+            if magic != MAGIC or width != RECORD_WIDTH:
+                raise ValueError(f"Invalid symbol index file: {self.index_path}.")
+
+            self._count = count
+            self._data = data
+            return data
+
+    def _symbol_at(self, data, position):
+        offset = HEADER.size + position * RECORD_WIDTH
+        return data[offset:offset + SYMBOL_WIDTH].rstrip(b"\0")
+
+    def _find(self, symbol):
+        """ Accepts a symbol, returns its record position or -1 if it is not listed. """
+
+        data = self._data if self._data is not None else self._load()
+
+        try:
+            key = symbol.upper().encode("ascii")
+        except (AttributeError, UnicodeEncodeError):
+            return -1
+
+        position = self._bisect(data, key)
+        if position < self._count and self._symbol_at(data, position) == key:
+            return position
+        return -1
+
+    def _bisect(self, data, key):
+        """ Returns the position of the first record not less than key. """
+
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._symbol_at(data, middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def __contains__(self, symbol):
+        return self._find(symbol) >= 0
+
+    def __len__(self):
+        self._load()
+        return self._count
+
+    def __iter__(self):
+        data = self._load()
+        for position in range(self._count):
+            yield self._symbol_at(data, position).decode("ascii")
+
+    def exchange(self, symbol):
+        """ Accepts a symbol, returns the name of the exchange it is listed on or None. """
+
+        position = self._find(symbol)
+        if position < 0:
+            return None
+
+        offset = HEADER.size + position * RECORD_WIDTH + SYMBOL_WIDTH
+        return EXCHANGE_FILES[bytes(self._data[offset:offset + 1])][0]
+
+
+ALL_SYMBOLS = SymbolIndex()
+
+
+if __name__ == "__main__":
+    print(f"Compiled symbol index: {compile_symbol_index()}")
@@ -0,0 +1,165 @@
+import re
+import threading
+from bisect import bisect_left
+
+from app.exchange_data.symbol_index import (
+    ALL_SYMBOLS,
+    read_listing_names
+)
+
+# ranks of match kinds, lower ranks are listed first
+EXACT_SYMBOL = 0
+SYMBOL_PREFIX = 1
+NAME_PREFIX = 2
+FUZZY_SYMBOL = 3
+
+# upper bound on candidates collected per prefix range, keeps broad queries fast
+MAX_CANDIDATES = 200
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _deletions(term):
+    """ Accepts a term, returns the set of strings made by deleting one of its characters. """
+
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+class SymbolSearch:
+    """ Prefix and fuzzy search over listed symbols and company names. Built lazily from the
+        symbol index and listing files into sorted arrays, so a lookup is a few binary searches
+        and never touches the market data provider. """
+
+    def __init__(self, symbols=ALL_SYMBOLS):
+        self._source = symbols
+        self._symbols = None
+        self._symbol_set = set()
+        self._words = None
+        self._names = {}
+        self._exchanges = {}
+        self._deletes = {}
+        self._lock = threading.Lock()
+
+    def _build(self):
+        """ Builds the sorted symbol and name word arrays and the one-deletion map used for
+            fuzzy matches. """
+
+        with self._lock:
+            if self._symbols is not None:
+                return
+
+            symbols = sorted(self._source)
+            names = read_listing_names()
+            words = []
+            deletes = {}
+
+            for symbol in symbols:
+                for word in set(WORD_PATTERN.findall(names.get(symbol, "").lower())):
+                    words.append((word, symbol))
+                for variant in _deletions(symbol):
+                    deletes.setdefault(variant, []).append(symbol)
+
+            words.sort()
+
+            self._names = names
+            self._exchanges = {symbol: self._source.exchange(symbol) for symbol in symbols}
+            self._deletes = deletes
+            self._words = words
+            self._symbol_set = set(symbols)
+            self._symbols = symbols
+
+    def _symbol_prefix(self, prefix):
+        """ Returns up to MAX_CANDIDATES symbols starting with prefix. """
+
+        matches = []
+        for position in range(bisect_left(self._symbols, prefix), len(self._symbols)):
+            symbol = self._symbols[position]
+            if not symbol.startswith(prefix) or len(matches) >= MAX_CANDIDATES:
+                break
+            matches.append(symbol)
+        return matches
+
+    def _name_prefix(self, prefix):
+        """ Returns up to MAX_CANDIDATES symbols whose company name has a word starting
+            with prefix. """
+
+        matches = []
+        for position in range(bisect_left(self._words, (prefix,)), len(self._words)):
+            word, symbol = self._words[position]
+            if not word.startswith(prefix) or len(matches) >= MAX_CANDIDATES:
+                break
+            matches.append(symbol)
+        return matches
+
+    def _fuzzy_symbol(self, term):
+        """ Returns symbols one insertion, deletion or substitution away from term. """
+
+        # symbols with one extra character
+        matches = set(self._deletes.get(term, []))
+
+        for variant in _deletions(term):
+
+            # symbols with one character missing
+            if variant in self._symbol_set:
+                matches.add(variant)
+
+            # symbols with one character substituted
+            matches.update(self._deletes.get(variant, []))
+
+        matches.discard(term)
+        return matches
+
+    def search(self, query, limit=10):
+        """ Accepts a search query, returns up to limit ranked matches as dictionaries with
+            the symbol, company name and exchange. Exact symbols rank first, then symbol
+            prefixes, company name word prefixes and finally symbols one typo away. """
+
+        if self._symbols is None:
+            self._build()
+
+        query = (query or "").strip()
+        if not query:
+            return []
+
+        term = query.upper()
+        words = WORD_PATTERN.findall(query.lower())
+        ranked = {}
+
+        def add(symbol, rank):
+            if symbol not in ranked or rank < ranked[symbol]:
+                ranked[symbol] = rank
+
+        # symbol matches
+        for symbol in self._symbol_prefix(term):
+            add(symbol, EXACT_SYMBOL if symbol == term else SYMBOL_PREFIX)
+
+        # company name matches, every query word must prefix a word of the name
+        if words:
+            for symbol in self._name_prefix(words[0]):
+                name_words = WORD_PATTERN.findall(self._names.get(symbol, "").lower())
+                if all(any(w.startswith(q) for w in name_words) for q in words[1:]):
+                    add(symbol, NAME_PREFIX)
+
+        # fall back to symbols one typo away if there are too few matches
+        if len(ranked) < limit and len(term) > 1:
+            for symbol in self._fuzzy_symbol(term):
+                add(symbol, FUZZY_SYMBOL)
+
+        # order by rank, then shorter and alphabetically earlier symbols
+        ordered = sorted(ranked, key=lambda symbol: (ranked[symbol], len(symbol), symbol))
+
+        return [{
+            "symbol": symbol,
+            "name": self._names.get(symbol, ""),
+            "exchange": self._exchanges.get(symbol)
+        } for symbol in ordered[:limit]]
+
+
+SYMBOL_SEARCH = SymbolSearch()
+
+
+def search_symbols(query, limit=10):
+    """ Accepts a search query and a maximum number of results, returns ranked symbol and
+        company name completions. """
+
+    return SYMBOL_SEARCH.search(query, limit)
@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from decimal import Decimal
+
+from app.db_core import DBCore
+
+from app.trade.trade_repo import (
+    TRADE_EXPORT_COLUMNS,
+    select_trades_for_export
+)
+from app.transaction.transaction_repo import (
+    TRANSACTION_EXPORT_COLUMNS,
+    select_transactions_for_export
+)
+from app.utils import parse_date_range
+
+# rows fetched from the server-side cursor, and written to the response, at a time
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+# supported export formats and their mimetypes
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+
+def _json_value(value):
+    """ Converts a database value into one json can encode. """
+
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _format_chunk(columns, rows, export_format):
+    """ Accepts column names, a chunk of rows and an export format, returns the rows
+        formatted as a single string. """
+
+    if export_format == "ndjson":
+        return "".join(json.dumps({column: _json_value(value) for column, value in zip(columns, row)}) + "\n"
+                       for row in rows)
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+
+def _stream_rows(select, columns, user_id, start_date, end_date, export_format, chunk_size):
+    """ Runs select on a named psycopg2 cursor and yields the selected rows formatted in
+        chunks of chunk_size, so only one chunk is ever held in memory. The connection is
+        dedicated to the stream and returned to the pool when it ends or is abandoned. """
+
+    if export_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(columns)
+        yield buffer.getvalue()
+
+    with DBCore.get_dedicated_connection() as conn:
+
+        # a named cursor keeps the result set on the server until it is fetched
+        with conn.cursor(name=f"export_{user_id}") as cur:
+            cur.itersize = chunk_size
+            select(cur, user_id, start_date, end_date)
+
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield _format_chunk(columns, rows, export_format)
+
+
+def export_trades(user_id, export_format="csv", start_date=None, end_date=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """ Accepts a user_id, export format and optionally start and end dates, returns a
+        generator of the user's trades formatted as csv or ndjson, oldest first. Raises
+        ValueError if a date is malformed. """
+
+    start_date, end_date = parse_date_range(start_date, end_date)
+
+    return _stream_rows(select_trades_for_export, TRADE_EXPORT_COLUMNS, user_id,
+                        start_date, end_date, export_format, chunk_size)
+
+
+def export_transactions(user_id, export_format="csv", start_date=None, end_date=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """ Accepts a user_id, export format and optionally start and end dates, returns a
+        generator of the user's deposits and withdrawals formatted as csv or ndjson,
+        oldest first. Raises ValueError if a date is malformed. """
+
+    start_date, end_date = parse_date_range(start_date, end_date)
+
+    return _stream_rows(select_transactions_for_export, TRANSACTION_EXPORT_COLUMNS, user_id,
+                        start_date, end_date, export_format, chunk_size)
@@ -6,6 +6,7 @@ from reportlab.lib.units import mm
 from reportlab.lib import colors
 from reportlab.pdfgen import canvas
 from datetime import datetime
+from itertools import chain, islice
 
 from app.portfolio.portfolio_service import (
     get_portfolio
@@ -15,6 +16,22 @@ from app.user.user_service import (
     get_user
 )
 
+# statements with more rows than this, or built from an iterator, use the low-memory mode
+PDF_LARGE_DOCUMENT_ROWS = int(os.getenv("PDF_LARGE_DOCUMENT_ROWS", "2000"))
+
+# rows per table, one table per page
+ROWS_PER_PAGE = 25
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), colors.grey),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+    ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('FONTNAME', (0,1), (-1,-1), 'Helvetica'),
+    ('FONTSIZE', (0,0), (-1,-1), 9),
+])
+
 # tested, functional, commented
 class NumberedCanvas(canvas.Canvas):
     """Custom canvas class to add page numbers 'Page X of Y'"""
@@ -40,6 +57,111 @@ class NumberedCanvas(canvas.Canvas):
         self.drawRightString(200*mm, 15*mm, page_number_text)
 
 
+class StreamingNumberedCanvas(canvas.Canvas):
+    """Canvas adding 'Page X of Y' without keeping any page in memory. Each page is written
+    out as soon as it ends and refers to a PDF form holding the page count, which is only
+    defined once the count is known, when the document is saved."""
+
+    PAGE_COUNT_FORM = "page_count"
+
+    def showPage(self):
+        self.draw_page_number()
+        super(StreamingNumberedCanvas, self).showPage()
+
+    def save(self):
+        # the last page has been shown, so the current page number is one past the count
+        self.beginForm(self.PAGE_COUNT_FORM)
+        self.setFont("Helvetica", 9)
+        self.drawString(0, 0, str(self._pageNumber - 1))
+        self.endForm()
+        super(StreamingNumberedCanvas, self).save()
+
+    def draw_page_number(self):
+        self.setFont("Helvetica", 9)
+        page_number_text = f"Page {self._pageNumber} of "
+        self.drawString(180*mm, 15*mm, page_number_text)
+
+        # place the page count form right after the text
+        self.saveState()
+        self.translate(180*mm + self.stringWidth(page_number_text, "Helvetica", 9), 15*mm)
+        self.doForm(self.PAGE_COUNT_FORM)
+        self.restoreState()
+
+
+class LazyFlowables(list):
+    """List of flowables filled from an iterator as the document consumes it, so only the
+    next few flowables exist at any time. reportlab's build loop only reads and edits the
+    front of the list."""
+
+    def __init__(self, flowables, lookahead=2):
+        super(LazyFlowables, self).__init__()
+        self._source = iter(flowables)
+        self._lookahead = lookahead
+
+    def _fill(self):
+        while self._source is not None and list.__len__(self) < self._lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
+
+
+def table_chunks(table_header, rows):
+    """Yields a table of at most ROWS_PER_PAGE rows, each on its own page, for every chunk of
+    an iterator of table rows. Only one chunk is built at a time."""
+
+    rows = iter(rows)
+    first = True
+    while True:
+        chunk = list(islice(rows, ROWS_PER_PAGE))
+        if not chunk:
+            return
+
+        if not first:
+            yield PageBreak()
+        first = False
+
+        table = Table([table_header] + chunk, repeatRows=1)
+        table.setStyle(TABLE_STYLE)
+        yield table
+
+
+def _is_large(items):
+    """Returns true if items is an iterator or holds more than PDF_LARGE_DOCUMENT_ROWS items."""
+
+    return not hasattr(items, "__len__") or len(items) > PDF_LARGE_DOCUMENT_ROWS
+
+
+def build_statement(doc, elements, table_header, rows, empty_message, low_memory=False):
+    """Builds the statement from its header elements and an iterator of table rows. In
+    low-memory mode the tables are built lazily and pages are written as they are finished,
+    so memory use does not grow with the number of rows."""
+
+    rows = iter(rows)
+    first = next(rows, None)
+
+    # If no rows
+    if first is None:
+        elements.append(Paragraph(empty_message, getSampleStyleSheet()["Normal"]))
+        doc.build(elements, canvasmaker=NumberedCanvas)
+        return
+
+    flowables = chain(elements, table_chunks(table_header, chain([first], rows)))
+
+    if low_memory:
+        doc.build(LazyFlowables(flowables), canvasmaker=StreamingNumberedCanvas)
+    else:
+        doc.build(list(flowables), canvasmaker=NumberedCanvas)
+
+
 # tested, functional, commented
 def generate_portfolio_statement(user_id, filename=None):
     """
@@ -48,9 +170,9 @@ def generate_portfolio_statement(user_id, filename=None):
     Auto-generates a unique filename if not provided.
     Saves into app/static/pdfs/portfolio_statement
     """
-    # Fetch portfolio and user
+    # Fetch portfolio and user. worker processes never see invalidations, so bypass the cache
     user = get_user(user_id)
-    portfolio = get_portfolio(user_id)
+    portfolio = get_portfolio(user_id, use_cache=False)
 
     # Define save path inside static/pdfs/portfolio_statement
     base_dir = os.path.join(os.path.dirname(__file__), "static", "pdfs", "portfolio_statement")
@@ -88,54 +210,24 @@ def generate_portfolio_statement(user_id, filename=None):
     elements.append(Paragraph(summary_text, normal_style))
     elements.append(Spacer(1, 20))
 
-    if not portfolio.positions:
-        elements.append(Paragraph("You currently hold no equities.", normal_style))
-        doc.build(elements, canvasmaker=NumberedCanvas)
-        return filepath
-
     table_header = ["#", "Symbol", "Company", "Avg Cost", "Current Price", "Shares", "Position Value"]
 
-    positions = list(portfolio.positions.values())
-    row_number = 1
-    for i in range(0, len(positions), 25):
-        chunk = positions[i:i+25]
-        table_data = [table_header]
-
-        for pos in chunk:
-            row = [
-                str(row_number),
-                pos.symbol,
-                pos.company_name,
-                f"${pos.price_per_share:,.2f}",
-                f"${pos.last_price_per_share:,.2f}",
-                str(pos.number_of_shares),
-                f"${pos.total_value:,.2f}"
-            ]
-            table_data.append(row)
-            row_number += 1
-
-        table = Table(table_data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.grey),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTNAME', (0,1), (-1,-1), 'Helvetica'),
-            ('FONTSIZE', (0,0), (-1,-1), 9),
-        ]))
-
-        elements.append(table)
-
-        if i + 25 < len(positions):
-            elements.append(PageBreak())
-
-    doc.build(elements, canvasmaker=NumberedCanvas)
+    rows = ([
+        str(row_number),
+        pos.symbol,
+        pos.company_name,
+        f"${pos.price_per_share:,.2f}",
+        f"${pos.last_price_per_share:,.2f}",
+        str(pos.number_of_shares),
+        f"${pos.total_value:,.2f}"
+    ] for row_number, pos in enumerate((portfolio.positions or {}).values(), 1))
+
+    build_statement(doc, elements, table_header, rows, "You currently hold no equities.", low_memory=False)
     return filepath
 
 
 # tested, functional, commented
-def generate_trade_statement(user_id, trades, filename=None):
+def generate_trade_statement(user_id, trades, filename=None, user=None, low_memory=None):
     """
     Generates a PDF statement for a user's trade history.
     Limits 25 trades per page.
@@ -143,13 +235,16 @@ def generate_trade_statement(user_id, trades, filename=None):
     
     Args:
         user_id: int
-        trades: list of Trade objects
+        trades: list or iterator of Trade objects
         filename: optional custom filename
+        user: optional user object, fetched if not provided
+        low_memory: optional, defaults to true for iterators and long lists
     Returns:
         str: full filepath of generated PDF
     """
     # Fetch user info
-    user = get_user(user_id)
+    if user is None:
+        user = get_user(user_id)
 
     # Define save path inside static/pdfs/trade_history
     base_dir = os.path.join(os.path.dirname(__file__), "static", "pdfs", "trade_history")
@@ -180,62 +275,30 @@ def generate_trade_statement(user_id, trades, filename=None):
     elements.append(Paragraph(header_text, normal_style))
     elements.append(Spacer(1, 12))
 
-    # If no trades
-    if not trades:
-        elements.append(Paragraph("No trades found for the selected period.", normal_style))
-        doc.build(elements, canvasmaker=NumberedCanvas)
-        return filepath
-
     # Table header
     table_header = ["#", "Trade ID", "Date/Time", "Symbol", "Company", "Type", "Price/Share", "Shares", "Total Value"]
 
-    # Split trades into chunks of 25
-    row_number = 1
-    for i in range(0, len(trades), 25):
-        chunk = trades[i:i+25]
-
-        # Build table rows
-        table_data = [table_header]
-        for trade in chunk:
-            row = [
-                str(row_number),
-                getattr(trade, "trade_id", "-"),
-                getattr(trade, "timestamp", "").strftime("%Y-%m-%d %H:%M:%S") if getattr(trade, "timestamp", None) else "-",
-                trade.symbol,
-                trade.company_name,
-                trade.trade_type.upper(),
-                f"${trade.price_per_share:,.2f}",
-                str(trade.number_of_shares),
-                f"${trade.trade_total:,.2f}"
-            ]
-            table_data.append(row)
-            row_number += 1
-
-        # Create table
-        table = Table(table_data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.grey),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTNAME', (0,1), (-1,-1), 'Helvetica'),
-            ('FONTSIZE', (0,0), (-1,-1), 9),
-        ]))
-
-        elements.append(table)
-
-        # Add page break if not last chunk
-        if i + 25 < len(trades):
-            elements.append(PageBreak())
-
-    # Build PDF with custom canvas (adds page numbers)
-    doc.build(elements, canvasmaker=NumberedCanvas)
+    # Build table rows as the document needs them
+    rows = ([
+        str(row_number),
+        getattr(trade, "trade_id", "-"),
+        getattr(trade, "timestamp", "").strftime("%Y-%m-%d %H:%M:%S") if getattr(trade, "timestamp", None) else "-",
+        trade.symbol,
+        trade.company_name,
+        trade.trade_type.upper(),
+        f"${trade.price_per_share:,.2f}",
+        str(trade.number_of_shares),
+        f"${trade.trade_total:,.2f}"
+    ] for row_number, trade in enumerate(trades, 1))
+
+    # Build PDF with numbered pages, 25 trades per page
+    build_statement(doc, elements, table_header, rows, "No trades found for the selected period.",
+                    low_memory if low_memory is not None else _is_large(trades))
     return filepath
 
 
 # tested, functional, commented
-def generate_transaction_statement(user_id, transactions, filename=None):
+def generate_transaction_statement(user_id, transactions, filename=None, user=None, low_memory=None):
     """
     Generates a PDF statement for a user's transaction history.
     Limits 25 transactions per page.
@@ -243,13 +306,16 @@ def generate_transaction_statement(user_id, transactions, filename=None):
     
     Args:
         user_id: int
-        transactions: list of Transaction objects
+        transactions: list or iterator of Transaction objects
         filename: optional custom filename
+        user: optional user object, fetched if not provided
+        low_memory: optional, defaults to true for iterators and long lists
     Returns:
         str: full filepath of generated PDF
     """
     # Fetch user info
-    user = get_user(user_id)
+    if user is None:
+        user = get_user(user_id)
 
     # Define save path inside static/pdfs/transaction_history
     base_dir = os.path.join(os.path.dirname(__file__), "static", "pdfs", "transaction_history")
@@ -279,47 +345,19 @@ def generate_transaction_statement(user_id, transactions, filename=None):
     elements.append(Paragraph(header_text, normal_style))
     elements.append(Spacer(1, 12))
 
-    # If no transactions
-    if not transactions:
-        elements.append(Paragraph("No transactions found for the selected period.", normal_style))
-        doc.build(elements, canvasmaker=NumberedCanvas)
-        return filepath
-
     # Table header
     table_header = ["#", "Transaction ID", "Date/Time", "Type", "Amount"]
 
-    # Split into chunks of 25
-    row_number = 1
-    for i in range(0, len(transactions), 25):
-        chunk = transactions[i:i+25]
-
-        table_data = [table_header]
-        for tx in chunk:
-            row = [
-                str(row_number),
-                getattr(tx, "transaction_id", "-"),
-                getattr(tx, "timestamp", "").strftime("%Y-%m-%d %H:%M:%S") if getattr(tx, "timestamp", None) else "-",
-                tx.transaction_type.upper(),
-                f"${tx.amount:,.2f}"
-            ]
-            table_data.append(row)
-            row_number += 1
-
-        table = Table(table_data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.grey),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTNAME', (0,1), (-1,-1), 'Helvetica'),
-            ('FONTSIZE', (0,0), (-1,-1), 9),
-        ]))
-
-        elements.append(table)
-
-        if i + 25 < len(transactions):
-            elements.append(PageBreak())
-
-    doc.build(elements, canvasmaker=NumberedCanvas)
-    return filepath
\ No newline at end of file
+    # Build table rows as the document needs them
+    rows = ([
+        str(row_number),
+        getattr(tx, "transaction_id", "-"),
+        getattr(tx, "timestamp", "").strftime("%Y-%m-%d %H:%M:%S") if getattr(tx, "timestamp", None) else "-",
+        tx.transaction_type.upper(),
+        f"${tx.amount:,.2f}"
+    ] for row_number, tx in enumerate(transactions, 1))
+
+    # Build PDF with numbered pages, 25 transactions per page
+    build_statement(doc, elements, table_header, rows, "No transactions found for the selected period.",
+                    low_memory if low_memory is not None else _is_large(transactions))
+    return filepath
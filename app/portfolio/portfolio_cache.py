@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# portfolio snapshot cache settings
+PORTFOLIO_CACHE_MAX_AGE = float(os.getenv("PORTFOLIO_CACHE_MAX_AGE", "30"))
+PORTFOLIO_CACHE_MAX_SIZE = int(os.getenv("PORTFOLIO_CACHE_MAX_SIZE", "1024"))
+
+
+class PortfolioCache:
+    """ Thread-safe LRU cache of portfolio snapshots keyed by user_id. A snapshot is dropped
+        as soon as an order or transfer of its user commits, and otherwise expires after
+        max_age seconds so the prices it was valued at never get older than that. Cached
+        portfolios are shared between callers and must not be modified. """
+
+    def __init__(self, max_age=PORTFOLIO_CACHE_MAX_AGE, max_size=PORTFOLIO_CACHE_MAX_SIZE):
+        self.max_age = max_age
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        # bumped on every invalidation, so a snapshot read before an order commits is not stored after it
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "discarded": 0,
+            "evictions": 0
+        }
+
+    def generation(self, user_id):
+        """ Returns the user's invalidation count, to be passed to put with the snapshot
+            read after it. """
+
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def get(self, user_id):
+        """ Returns the user's fresh cached portfolio or None. """
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+
+            if entry is not None and time.monotonic() >= entry[1]:
+                del self._entries[user_id]
+                entry = None
+
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, user_id, portfolio, generation):
+        """ Stores the user's portfolio, unless the user was invalidated since generation
+            was read, evicting the least recently used snapshots. """
+
+        with self._lock:
+            if self._generations.get(user_id, 0) != generation:
+                self._stats["discarded"] += 1
+                return
+
+            self._entries[user_id] = (portfolio, time.monotonic() + self.max_age)
+            self._entries.move_to_end(user_id)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, user_id):
+        """ Drops the user's snapshot and any snapshot of the user still being read. """
+
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._stats["invalidations"] += 1
+
+    def clear(self):
+        """ Removes every cached snapshot. """
+
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """ Returns a dict of hit, miss and invalidation counters. """
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            return stats
+
+
+PORTFOLIO_CACHE = PortfolioCache()
+
+
+def invalidate_portfolio(user_id):
+    """ Accepts a user_id, drops the user's cached portfolio. Called once a change to the
+        user's cash or holdings commits. """
+
+    PORTFOLIO_CACHE.invalidate(user_id)
+
+
+def portfolio_cache_stats():
+    """ Returns the portfolio cache's counters. """
+
+    return PORTFOLIO_CACHE.stats()
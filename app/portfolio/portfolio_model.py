@@ -3,6 +3,8 @@ class Portfolio:
     def __init__(self, user, total_equities_value=None, positions=None):
         self.user = user
         self.cash_balance = user.cash_balance
+        # only known when built from a valuation
+        self.unrealized_pnl = None
 
         # if user has open equity positions
         if positions:
@@ -14,6 +16,20 @@ class Portfolio:
             self.positions = None
             self.positions_value = 0
             self.portfolio_value = float(self.cash_balance)
+
+    @classmethod
+    def from_valuation(cls, user, valuation):
+        """ Accepts a user object and a Valuation from the valuation engine, returns the
+            user's portfolio with its positions and totals taken from the valuation. """
+
+        positions = valuation.user_positions(user.id)
+        if not positions:
+            return cls(user)
+
+        total_equities_value, cost, unrealized_pnl = valuation.user_totals(user.id)
+        portfolio = cls(user, total_equities_value, positions)
+        portfolio.unrealized_pnl = unrealized_pnl
+        return portfolio
     
     # prints portfolio. this is more of a testing function for now
     def print_portfolio(self):
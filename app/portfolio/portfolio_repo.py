@@ -0,0 +1,68 @@
+def revalue_portfolios(cur, first_user_id, last_user_id):
+    """ Accepts cursor and an inclusive range of user ids. In a single statement, values the
+        holdings of every user in the range at the prices in the quotes table, falling back
+        to the last price of the holding's most recent lot, and writes each user's cash,
+        positions value, cost basis and portfolio value to portfolio_valuations. Returns the
+        number of users valued. """
+
+    cur.execute("""
+        WITH valued AS (
+            SELECT h.user_id,
+                   SUM(h.shares * COALESCE(q.price, lot.last_price_per_share)) AS positions_value,
+                   SUM(h.cost_basis) AS cost_basis
+            FROM holdings h
+            LEFT JOIN quotes q ON q.symbol = h.symbol
+            LEFT JOIN LATERAL (
+                SELECT p.last_price_per_share
+                FROM positions p
+                WHERE q.price IS NULL AND p.user_id = h.user_id AND p.symbol = h.symbol
+                ORDER BY p.position_id DESC
+                LIMIT 1
+            ) lot ON true
+            WHERE h.user_id BETWEEN %(first)s AND %(last)s
+            GROUP BY h.user_id
+        )
+        INSERT INTO portfolio_valuations (user_id, cash_balance, positions_value, cost_basis,
+                                          portfolio_value, valued_at)
+        SELECT u.id, u.cash_balance,
+               ROUND(COALESCE(v.positions_value, 0), 2),
+               COALESCE(v.cost_basis, 0),
+               ROUND(u.cash_balance + COALESCE(v.positions_value, 0), 2),
+               CURRENT_TIMESTAMP
+        FROM users u
+        LEFT JOIN valued v ON v.user_id = u.id
+        WHERE u.id BETWEEN %(first)s AND %(last)s
+        ON CONFLICT (user_id) DO UPDATE SET
+            cash_balance = EXCLUDED.cash_balance,
+            positions_value = EXCLUDED.positions_value,
+            cost_basis = EXCLUDED.cost_basis,
+            portfolio_value = EXCLUDED.portfolio_value,
+            valued_at = EXCLUDED.valued_at
+    """, {"first": first_user_id, "last": last_user_id})
+
+    return cur.rowcount
+
+
+def get_portfolio_valuation(cur, user_id):
+    """ Accepts cursor and user_id, returns the user's latest bulk valuation as a dictionary,
+        or None if the user has not been valued yet. """
+
+    cur.execute("""
+        SELECT cash_balance, positions_value, cost_basis, portfolio_value, valued_at
+        FROM portfolio_valuations
+        WHERE user_id=%s
+    """, (user_id,))
+
+    row = cur.fetchone()
+
+    if not row:
+        return None
+
+    cash_balance, positions_value, cost_basis, portfolio_value, valued_at = row
+    return {
+        "cash_balance": cash_balance,
+        "positions_value": positions_value,
+        "cost_basis": cost_basis,
+        "portfolio_value": portfolio_value,
+        "valued_at": valued_at
+    }
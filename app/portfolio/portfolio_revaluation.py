@@ -0,0 +1,85 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.db_core import DBCore
+from app.portfolio.portfolio_repo import revalue_portfolios
+from app.quote.quote_service import refresh_quotes
+from app.user.user_repo import get_user_id_ranges
+
+# bulk revaluation settings
+PORTFOLIO_REVALUATION_WORKERS = int(os.getenv("PORTFOLIO_REVALUATION_WORKERS", "4"))
+PORTFOLIO_REVALUATION_CHUNK_SIZE = int(os.getenv("PORTFOLIO_REVALUATION_CHUNK_SIZE", "5000"))
+
+
+def _revalue_chunk(first_user_id, last_user_id):
+    """ Revalues one range of users in its own transaction on its own connection. """
+
+    with DBCore.get_dedicated_connection() as conn:
+        with conn.cursor() as cur:
+            valued = revalue_portfolios(cur, first_user_id, last_user_id)
+        conn.commit()
+
+    return valued
+
+
+def revalue_all_portfolios(workers=PORTFOLIO_REVALUATION_WORKERS, chunk_size=PORTFOLIO_REVALUATION_CHUNK_SIZE,
+                           fetch_quotes=True, first_user_id=None, last_user_id=None):
+    """ Accepts a number of workers, chunk size and optionally a range of user ids, values
+        every user's portfolio and writes it to portfolio_valuations. If fetch_quotes is
+        set, the distinct symbols held by any user are first priced once in a single batch.
+        Users are then valued with one set-based statement per range of chunk_size users,
+        workers ranges at a time. """
+
+    try:
+        quotes_message = refresh_quotes()["message"] if fetch_quotes else "Quotes not refreshed."
+
+        # split the users into ranges of chunk_size ids
+        with DBCore.get_connection() as conn:
+            with conn.cursor() as cur:
+                chunks = get_user_id_ranges(cur, chunk_size, first_user_id, last_user_id)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            users = sum(executor.map(lambda chunk: _revalue_chunk(*chunk), chunks))
+        elapsed = time.perf_counter() - start
+
+        users_per_second = users / elapsed if elapsed else 0.0
+        return {
+            "success": True,
+            "message": (f"{quotes_message} Revalued {users} users in {len(chunks)} chunks "
+                        f"in {elapsed:.2f}s ({users_per_second:.0f} users/s)."),
+            "users": users,
+            "users_per_second": users_per_second
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error. Failed to revalue portfolios: {e}."
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Revalue every user's portfolio into portfolio_valuations.")
+    parser.add_argument("--workers", type=int, default=PORTFOLIO_REVALUATION_WORKERS,
+                        help="chunks valued in parallel, each on its own connection")
+    parser.add_argument("--chunk-size", type=int, default=PORTFOLIO_REVALUATION_CHUNK_SIZE,
+                        help="users valued per statement")
+    parser.add_argument("--first-user-id", type=int, default=None)
+    parser.add_argument("--last-user-id", type=int, default=None)
+    parser.add_argument("--no-fetch-quotes", action="store_true",
+                        help="value at the prices already in the quotes table")
+    args = parser.parse_args()
+
+    result = revalue_all_portfolios(args.workers, args.chunk_size, not args.no_fetch_quotes,
+                                    args.first_user_id, args.last_user_id)
+    print(result["message"])
+
+    if not result["success"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,31 @@
 from app.db_core import DBCore
+from app.portfolio.portfolio_cache import PORTFOLIO_CACHE
 from app.portfolio.portfolio_model import Portfolio
-from app.position.position_repo import get_user_equity_symbols
+from app.position.position_repo import get_user_holdings
 
 from app.user.user_service import (
     get_user_by_id
 )
 
 from app.position.position_service import (
-    aggregate_all_equity_positions,
-    aggregate_total_value_of_equity_positions,
-    update_positions_in_table
+    aggregate_total_value_of_equity_positions
 )
 
 
 # tested, functional, commented
-def get_portfolio(user_id):
-    """ Accepts a user_id and returns a portfolio object. """
+def get_portfolio(user_id, use_cache=True):
+    """ Accepts a user_id and returns a portfolio object. Positions are valued at the
+        prices kept current in the quotes table by the background quote refresher.
+        Unless use_cache is False, a snapshot from the portfolio cache is returned if the
+        user has not traded or moved funds since it was taken and it is recent enough. """
 
-    # update equity positions in positions table with live equity prices
-    update_positions_in_table(user_id)
+    if use_cache:
+        portfolio = PORTFOLIO_CACHE.get(user_id)
+        if portfolio is not None:
+            return portfolio
+
+    # read before loading, so an order committing meanwhile keeps the result out of the cache
+    generation = PORTFOLIO_CACHE.generation(user_id)
 
     try:
         with DBCore.get_connection() as conn:
@@ -34,19 +41,12 @@ def get_portfolio(user_id):
                         "message": "Failed to fetch user."
                     }
                 
-                # check if user has any equities in positions table
-                if equity_symbols := get_user_equity_symbols(cur, user_id):
+                # aggregate all positions per equity into single Position objects in one query
+                all_positions = get_user_holdings(cur, user_id)
 
-                    # if they do, aggregate all positions into a single Position object
-                    all_positions = aggregate_all_equity_positions(cur, user_id, equity_symbols)
+                # check if user has any equities in positions table
+                if all_positions:
 
-                    # ensure positions are found
-                    if not all_positions:
-                        return {
-                            "success": False,
-                            "message": "Failed to aggregate positions."
-                        }
-                    
                     # get total value of all equities
                     total_equities_value = aggregate_total_value_of_equity_positions(all_positions)
                     
@@ -58,11 +58,14 @@ def get_portfolio(user_id):
                         }
 
                     # instantiate portfolio object with equities and cash_balance
-                    return Portfolio(user, total_equities_value, all_positions)
+                    portfolio = Portfolio(user, total_equities_value, all_positions)
 
                 # if user has no open equity positions, instantiate portfolio object with cash_balance only
                 else:
-                    return Portfolio(user)
+                    portfolio = Portfolio(user)
+
+        PORTFOLIO_CACHE.put(user_id, portfolio, generation)
+        return portfolio
                 
     except Exception as e:
         return {
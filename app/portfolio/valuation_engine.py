@@ -0,0 +1,155 @@
+import numpy as np
+
+from app.position.position_model import Position
+from app.stock.stock_model import Stock
+
+
+class Lots:
+    """ Lots of one or many users as parallel NumPy arrays, one element per lot. Symbols are
+        stored once, each lot pointing at its symbol by index. """
+
+    def __init__(self, user_ids, symbol_index, shares, cost, last_prices, symbols, company_names):
+        self.user_ids = user_ids
+        self.symbol_index = symbol_index
+        self.shares = shares
+        self.cost = cost
+        self.last_prices = last_prices
+        self.symbols = symbols
+        self.company_names = company_names
+
+    def __len__(self):
+        return len(self.shares)
+
+
+class Valuation:
+    """ Lots valued against a price vector. Holds per-lot market value and unrealized P&L,
+        the same summed per (user, symbol) holding with each holding's weight in its user's
+        equities, and per-user totals. """
+
+    def __init__(self, lots, prices, market_value, pnl, holding_users, holding_symbols,
+                 holding_shares, holding_cost, holding_value, holding_weights,
+                 users, user_value, user_cost):
+        self.lots = lots
+        self.prices = prices
+        self.market_value = market_value
+        self.pnl = pnl
+        self.holding_users = holding_users
+        self.holding_symbols = holding_symbols
+        self.holding_shares = holding_shares
+        self.holding_cost = holding_cost
+        self.holding_value = holding_value
+        self.holding_weights = holding_weights
+        self.users = users
+        self.user_value = user_value
+        self.user_cost = user_cost
+
+    @property
+    def holding_pnl(self):
+        return self.holding_value - self.holding_cost
+
+    @property
+    def user_pnl(self):
+        return self.user_value - self.user_cost
+
+    def user_totals(self, user_id):
+        """ Accepts a user_id, returns the user's (market value, cost, unrealized P&L), all
+            zero if the user holds no lots. """
+
+        i = np.searchsorted(self.users, user_id)
+        if i == len(self.users) or self.users[i] != user_id:
+            return 0.0, 0.0, 0.0
+        return float(self.user_value[i]), float(self.user_cost[i]), float(self.user_value[i] - self.user_cost[i])
+
+    def user_positions(self, user_id):
+        """ Accepts a user_id, returns a dictionary with symbols as keys and Position objects
+            holding the user's total shares, average cost, price and market value as values. """
+
+        # holdings are sorted by user, so the user's holdings are one contiguous slice
+        start, end = np.searchsorted(self.holding_users, [user_id, user_id + 1])
+        positions = {}
+
+        for i in range(start, end):
+            s = self.holding_symbols[i]
+            shares = int(self.holding_shares[i])
+            symbol = str(self.lots.symbols[s])
+            stock = Stock(company_name=str(self.lots.company_names[s]), symbol=symbol,
+                          price=float(self.holding_cost[i]) / shares)
+            positions[symbol] = Position(stock=stock, number_of_shares=shares, user_id=user_id,
+                                         total_value=float(self.holding_value[i]),
+                                         last_price_per_share=float(self.holding_value[i]) / shares)
+
+        return positions
+
+
+def lots_from_rows(rows):
+    """ Accepts (user_id, symbol, company_name, number_of_shares, average_price_per_share,
+        last_price_per_share) rows with float prices, returns them as Lots. The last price
+        is the one a lot is valued at when its symbol has no quote. """
+
+    if not rows:
+        return Lots(np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0), np.empty(0),
+                    np.empty(0), np.empty(0, object), np.empty(0, object))
+
+    user_ids, symbols, company_names, shares, cost, last_prices = zip(*rows)
+
+    # number each distinct symbol, keeping one company name per symbol
+    unique_symbols, first, symbol_index = np.unique(np.array(symbols, dtype=object),
+                                                    return_index=True, return_inverse=True)
+
+    return Lots(
+        user_ids=np.array(user_ids, dtype=np.int64),
+        symbol_index=symbol_index.astype(np.int64),
+        shares=np.array(shares, dtype=np.float64),
+        cost=np.array(cost, dtype=np.float64),
+        last_prices=np.array(last_prices, dtype=np.float64),
+        symbols=unique_symbols,
+        company_names=np.array(company_names, dtype=object)[first]
+    )
+
+
+def price_vector(lots, prices):
+    """ Accepts Lots and a dictionary of prices keyed by symbol, returns the prices as an
+        array aligned with lots.symbols, NaN where a symbol has no price. """
+
+    return np.array([prices.get(symbol, np.nan) for symbol in lots.symbols], dtype=np.float64)
+
+
+def value_lots(lots, prices):
+    """ Accepts Lots and a dictionary of prices keyed by symbol, returns their Valuation.
+        Lots of symbols without a price are valued at their last price, which get_lots sets
+        to the last price of the holding's most recent lot, as get_user_holdings does. """
+
+    vector = price_vector(lots, prices)
+
+    # price of every lot, falling back to its last stored price
+    lot_prices = vector[lots.symbol_index]
+    missing = np.isnan(lot_prices)
+    lot_prices = np.where(missing, lots.last_prices, lot_prices)
+
+    market_value = lots.shares * lot_prices
+    cost = lots.shares * lots.cost
+
+    # sum lots into one holding per (user, symbol), sorted by user then symbol
+    keys = lots.user_ids * len(lots.symbols) + lots.symbol_index
+    holding_keys, holding_of_lot = np.unique(keys, return_inverse=True)
+    holding_users, holding_symbols = np.divmod(holding_keys, max(len(lots.symbols), 1))
+    holding_shares = np.bincount(holding_of_lot, weights=lots.shares, minlength=len(holding_keys))
+    holding_cost = np.bincount(holding_of_lot, weights=cost, minlength=len(holding_keys))
+    holding_value = np.bincount(holding_of_lot, weights=market_value, minlength=len(holding_keys))
+
+    # sum holdings into per-user totals
+    users, user_of_holding = np.unique(holding_users, return_inverse=True)
+    user_value = np.bincount(user_of_holding, weights=holding_value, minlength=len(users))
+    user_cost = np.bincount(user_of_holding, weights=holding_cost, minlength=len(users))
+
+    # weight of each holding in its user's equities
+    totals = user_value[user_of_holding]
+    holding_weights = np.divide(holding_value, totals, out=np.zeros(len(holding_value)), where=totals != 0)
+
+    # report the price each symbol was valued at, the last price of one of its lots if unquoted
+    valued_prices = vector.copy()
+    valued_prices[lots.symbol_index[missing]] = lots.last_prices[missing]
+
+    return Valuation(lots, valued_prices, market_value, market_value - cost, holding_users,
+                     holding_symbols, holding_shares, holding_cost, holding_value, holding_weights,
+                     users, user_value, user_cost)
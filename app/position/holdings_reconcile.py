@@ -0,0 +1,45 @@
+import argparse
+
+from app.db_core import DBCore
+from app.position.position_repo import find_holdings_mismatches, rebuild_holdings
+
+
+def reconcile_holdings(user_id=None, rebuild=False):
+    """ Accepts optionally a user_id and whether to rebuild, compares the holdings table of
+        that user, or of every user, with the lots in positions. If rebuild is set, the
+        holdings are first rewritten from the lots. Returns the list of mismatches left. """
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor() as cur:
+            if rebuild:
+                rebuild_holdings(cur, user_id)
+            mismatches = find_holdings_mismatches(cur, user_id)
+        conn.commit()
+
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify or rebuild the holdings table from the lots in positions.")
+    parser.add_argument("--user-id", type=int, default=None,
+                        help="only reconcile this user (default: every user)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="rewrite holdings from the lots before verifying them")
+    args = parser.parse_args()
+
+    mismatches = reconcile_holdings(args.user_id, args.rebuild)
+
+    if args.rebuild:
+        print("Rebuilt holdings from positions.")
+    if not mismatches:
+        print("Holdings match positions.")
+    for user_id, symbol, shares, cost_basis, lot_shares, lot_cost_basis in mismatches:
+        print(f"user {user_id} {symbol}: holdings {shares} shares, {cost_basis} cost, "
+              f"lots {lot_shares} shares, {lot_cost_basis} cost")
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import argparse
+
+from app.position.position_service import POSITION_PRICE_REFRESH_BATCH, refresh_all_position_prices
+from app.quote.quote_service import refresh_quotes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy quoted prices onto the lots in positions.")
+    parser.add_argument("--batch-size", type=int, default=POSITION_PRICE_REFRESH_BATCH,
+                        help="lots updated per transaction")
+    parser.add_argument("--fetch-quotes", action="store_true",
+                        help="refresh the quotes table from the market data provider first")
+    args = parser.parse_args()
+
+    if args.fetch_quotes:
+        print(refresh_quotes()["message"])
+
+    result = refresh_all_position_prices(args.batch_size)
+    print(result["message"])
+
+    if not result["success"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+from psycopg2.extras import execute_values
 from app.stock.stock_model import Stock
 from app.position.position_model import Position
 from app.position.positions_model import Positions
@@ -47,6 +48,126 @@ def get_user_equity_symbols(cur, user_id):
     return symbols
 
 
+def get_user_holdings(cur, user_id, symbol=None):
+    """ Accepts cursor, user_id and optionally a symbol. Reads the user's holdings table
+        rows, one per equity, in a single indexed lookup, returning a dictionary with
+        symbols as keys and Position objects as values. Each Position holds the total
+        number of shares, the average cost per share, the last price and the market value.
+        The last price is read from the quotes table, falling back to the most recent
+        position's last price. """
+
+    # restrict to one equity if a symbol was provided
+    symbol_filter = "AND h.symbol=%s" if symbol else ""
+    params = (user_id, symbol) if symbol else (user_id,)
+
+    cur.execute(f"""
+        SELECT h.symbol,
+               h.company_name,
+               h.shares,
+               h.cost_basis,
+               COALESCE(q.price, (SELECT p.last_price_per_share FROM positions p
+                                  WHERE p.user_id = h.user_id AND p.symbol = h.symbol
+                                  ORDER BY p.position_id DESC LIMIT 1))
+        FROM holdings h
+        LEFT JOIN quotes q ON q.symbol = h.symbol
+        WHERE h.user_id=%s {symbol_filter}
+        ORDER BY h.symbol
+    """, params)
+
+    rows = cur.fetchall()
+    holdings = {}
+
+    for row in rows:
+        # unpack each holding
+        (symbol, company_name, number_of_shares, cost_basis, last_price_per_share) = row
+        number_of_shares = int(number_of_shares)
+        last_price_per_share = float(last_price_per_share)
+
+        # refactor into Stock and then Position objects, priced at average cost
+        stock = Stock(company_name=company_name, symbol=symbol, price=float(cost_basis) / number_of_shares)
+        holdings[symbol] = Position(stock=stock, number_of_shares=number_of_shares, user_id=user_id,
+                                    total_value=number_of_shares * last_price_per_share,
+                                    last_price_per_share=last_price_per_share)
+
+    return holdings
+
+
+def get_lots(cur, user_id=None):
+    """ Accepts cursor and optionally a user_id, returns every lot of that user, or of every
+        user, as NumPy arrays for the valuation engine. Prices are cast to float by the
+        database rather than converted from Decimal lot by lot. Each lot carries the last
+        price of its holding's most recent lot, the price get_user_holdings falls back to
+        for symbols without a quote. """
+
+    # imported here so only callers of the valuation engine load NumPy
+    from app.portfolio.valuation_engine import lots_from_rows
+
+    where = "WHERE user_id = %s" if user_id is not None else ""
+
+    cur.execute(f"""
+        SELECT user_id, symbol, company_name, number_of_shares,
+               average_price_per_share::float8,
+               FIRST_VALUE(last_price_per_share::float8)
+                   OVER (PARTITION BY user_id, symbol ORDER BY position_id DESC)
+        FROM positions
+        {where}
+    """, (user_id,) if user_id is not None else None)
+
+    return lots_from_rows(cur.fetchall())
+
+
+# holdings as aggregated from the lots in positions
+LOT_HOLDINGS_QUERY = """
+    SELECT user_id, symbol, MIN(company_name) AS company_name,
+           SUM(number_of_shares) AS shares,
+           SUM(number_of_shares * average_price_per_share) AS cost_basis
+    FROM positions
+    {where}
+    GROUP BY user_id, symbol
+"""
+
+
+def rebuild_holdings(cur, user_id=None):
+    """ Accepts cursor and optionally a user_id, replaces the holdings of that user, or of
+        every user, with the totals of their lots in positions. Locks both tables against
+        writes until the transaction ends. Returns the number of holdings written. """
+
+    cur.execute(""" LOCK TABLE positions, holdings IN SHARE ROW EXCLUSIVE MODE """)
+
+    where = "WHERE user_id = %(user_id)s" if user_id is not None else ""
+
+    cur.execute(f""" DELETE FROM holdings {where} """, {"user_id": user_id})
+    cur.execute(f"""
+        INSERT INTO holdings (user_id, symbol, company_name, shares, cost_basis)
+        {LOT_HOLDINGS_QUERY.format(where=where)}
+    """, {"user_id": user_id})
+
+    return cur.rowcount
+
+
+def find_holdings_mismatches(cur, user_id=None):
+    """ Accepts cursor and optionally a user_id, compares the holdings table with the totals
+        of the lots in positions. Returns a list of (user_id, symbol, holdings shares,
+        holdings cost basis, lot shares, lot cost basis) tuples that differ, with None for
+        a side that has no row. """
+
+    where = "WHERE user_id = %(user_id)s" if user_id is not None else ""
+
+    cur.execute(f"""
+        WITH lots AS ({LOT_HOLDINGS_QUERY.format(where=where)}),
+        held AS (SELECT * FROM holdings {where})
+        SELECT COALESCE(held.user_id, lots.user_id), COALESCE(held.symbol, lots.symbol),
+               held.shares, held.cost_basis, lots.shares, lots.cost_basis
+        FROM held
+        FULL OUTER JOIN lots ON lots.user_id = held.user_id AND lots.symbol = held.symbol
+        WHERE held.shares IS DISTINCT FROM lots.shares
+           OR held.cost_basis IS DISTINCT FROM lots.cost_basis
+        ORDER BY 1, 2
+    """, {"user_id": user_id})
+
+    return cur.fetchall()
+
+
 # tested, functional, commented
 def get_user_positions_of_equity(cur, user_id, symbol):
     """ Accepts cursor, user_id and symbol. Returns list of all open equity positions
@@ -174,23 +295,61 @@ def get_all_user_positions(cur, user_id):
 # tested, functional, commented
 def update_list_of_positions(cur, positions):
     """ Accepts a cursor and list of position objects, updating the last_price_per_share, 
-        number_of_shares and position_total. """  
-    
-    for p in positions:
-        cur.execute(""" UPDATE positions SET 
-            number_of_shares=%s,
-            last_price_per_share=%s,
-            position_total=%s
-            WHERE 
-            position_id=%s         
-        """, (
+        number_of_shares and position_total of all of them in a single statement. Returns
+        the number of positions that were updated. """  
+
+    if not positions:
+        return 0
+
+    updated = execute_values(cur, """ UPDATE positions SET
+            number_of_shares=v.number_of_shares,
+            last_price_per_share=v.last_price_per_share,
+            position_total=v.position_total
+        FROM (VALUES %s) AS v(position_id, number_of_shares, last_price_per_share, position_total)
+        WHERE
+        positions.position_id=v.position_id
+        RETURNING positions.position_id
+    """, [(
+            p.position_id,
             p.number_of_shares,
             p.last_price_per_share,
-            p.total_value,
-            p.position_id
-        ))
+            p.total_value
+        ) for p in positions],
+        template="(%s::integer, %s::integer, %s::numeric, %s::numeric)",
+        page_size=len(positions), fetch=True)
     
-    return cur.rowcount > 0
+    return len(updated)
+
+
+def refresh_position_prices(cur, after_position_id, batch_size):
+    """ Accepts cursor, a position_id and batch size. Sets last_price_per_share and
+        position_total of the next batch_size lots after position_id from the quotes table
+        in a single statement, skipping lots already valued at the quoted price so they
+        are not rewritten. Returns the last position_id of the batch, None once no lots
+        are left, and the number of lots updated. """
+
+    cur.execute("""
+        WITH batch AS (
+            SELECT position_id
+            FROM positions
+            WHERE position_id > %(after)s
+            ORDER BY position_id
+            LIMIT %(batch_size)s
+        ), updated AS (
+            UPDATE positions SET
+                last_price_per_share = q.price,
+                position_total = ROUND(positions.number_of_shares * q.price, 2)
+            FROM batch, quotes q
+            WHERE positions.position_id = batch.position_id
+              AND q.symbol = positions.symbol
+              AND (positions.last_price_per_share, positions.position_total)
+                  IS DISTINCT FROM (q.price, ROUND(positions.number_of_shares * q.price, 2))
+            RETURNING positions.position_id
+        )
+        SELECT (SELECT MAX(position_id) FROM batch), (SELECT COUNT(*) FROM updated)
+    """, {"after": after_position_id, "batch_size": batch_size})
+
+    return cur.fetchone()
 
 
 
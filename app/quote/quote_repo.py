@@ -0,0 +1,53 @@
+from psycopg2.extras import execute_values
+
+
+def get_held_symbols(cur):
+    """ Accepts a cursor, returns a list of every unique symbol held by any user. """
+
+    cur.execute(""" SELECT DISTINCT symbol FROM positions """)
+
+    return [symbol for (symbol,) in cur.fetchall()]
+
+
+def get_quote_prices(cur, symbols):
+    """ Accepts a cursor and list of symbols, returns a dictionary with the symbols that
+        have a quote as keys and their prices as floats as values. """
+
+    cur.execute(""" SELECT symbol, price::float8 FROM quotes WHERE symbol = ANY(%s) """, (list(symbols),))
+
+    return dict(cur.fetchall())
+
+
+def upsert_quotes(cur, prices):
+    """ Accepts a cursor and a dictionary with symbols as keys and live prices as values,
+        inserts or refreshes the quote of every symbol in a single statement. """
+
+    if not prices:
+        return 0
+
+    execute_values(cur, """
+        INSERT INTO quotes (symbol, price, as_of)
+        VALUES %s
+        ON CONFLICT (symbol) DO UPDATE SET price=EXCLUDED.price, as_of=EXCLUDED.as_of
+    """, [(symbol, price) for symbol, price in prices.items()],
+        template="(%s, %s, CURRENT_TIMESTAMP)", page_size=len(prices))
+
+    return cur.rowcount
+
+
+def try_lock_quote_refresh(cur, lock_id):
+    """ Accepts a cursor and lock id, returns true if the session-level advisory lock was
+        acquired, meaning no other process is refreshing quotes. The lock outlives the
+        transaction and is held until unlock_quote_refresh or the session ends. """
+
+    cur.execute(""" SELECT pg_try_advisory_lock(%s) """, (lock_id,))
+
+    return cur.fetchone()[0]
+
+
+def unlock_quote_refresh(cur, lock_id):
+    """ Accepts a cursor and lock id, releases the lock taken by try_lock_quote_refresh. """
+
+    cur.execute(""" SELECT pg_advisory_unlock(%s) """, (lock_id,))
+
+    return cur.fetchone()[0]
@@ -0,0 +1,102 @@
+import os
+import threading
+
+from app.db_core import DBCore
+from app.stock.stock_service import live_stock_prices
+
+from app.quote.quote_repo import (
+    get_held_symbols,
+    upsert_quotes,
+    try_lock_quote_refresh,
+    unlock_quote_refresh
+)
+
+# refresher settings
+QUOTE_REFRESH_INTERVAL = float(os.getenv("QUOTE_REFRESH_INTERVAL", "30"))
+QUOTE_REFRESH_ENABLED = os.getenv("QUOTE_REFRESH_ENABLED", "1") == "1"
+
+# advisory lock id ensuring only one process refreshes quotes at a time
+QUOTE_REFRESH_LOCK_ID = 7301
+
+
+def refresh_quotes():
+    """ Fetches a live price once for every symbol held by any user and stores it in the
+        quotes table. Skips the refresh if another process is already running one. Prices
+        are fetched with no transaction open, the connection only holds the refresh lock. """
+
+    try:
+        with DBCore.get_dedicated_connection() as conn:
+            with conn.cursor() as cur:
+
+                # ensure no other worker is refreshing quotes
+                if not try_lock_quote_refresh(cur, QUOTE_REFRESH_LOCK_ID):
+                    return {
+                        "success": False,
+                        "message": "Quotes are being refreshed by another process."
+                    }
+
+                try:
+                    # get union of all held symbols, then end the transaction before fetching
+                    symbols = get_held_symbols(cur)
+                    conn.commit()
+
+                    # fetch their prices in one batch
+                    prices = live_stock_prices(symbols)
+
+                    # store the fetched prices in a short transaction of its own
+                    upsert_quotes(cur, prices)
+                    conn.commit()
+
+                finally:
+                    # release the lock so the connection returns to the pool without it
+                    conn.rollback()
+                    unlock_quote_refresh(cur, QUOTE_REFRESH_LOCK_ID)
+                    conn.commit()
+
+                return {
+                    "success": True,
+                    "message": f"Refreshed {len(prices)} of {len(symbols)} quotes."
+                }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error. Failed to refresh quotes: {e}."
+        }
+
+
+class QuoteRefresher:
+    """ Daemon thread calling refresh_quotes every interval seconds. """
+
+    def __init__(self, interval=QUOTE_REFRESH_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            refresh_quotes()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """ Starts the refresher thread if it is not already running. """
+
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="quote-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """ Signals the refresher thread to stop after its current refresh. """
+
+        self._stop.set()
+
+
+QUOTE_REFRESHER = QuoteRefresher()
+
+
+def start_quote_refresher():
+    """ Starts the background quote refresher unless disabled by QUOTE_REFRESH_ENABLED. """
+
+    if QUOTE_REFRESH_ENABLED:
+        QUOTE_REFRESHER.start()
@@ -0,0 +1,20 @@
+from app.db_core import DBCore
+
+def define_holdings_table():
+    """ Creates the table holding every user's total shares and cost basis per equity,
+        maintained by every trade alongside the lots in positions. """
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS holdings(
+                    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                    symbol VARCHAR(20) NOT NULL,
+                    company_name VARCHAR(100) NOT NULL,
+                    shares INTEGER NOT NULL,
+                    cost_basis NUMERIC(14, 2) NOT NULL,
+                    PRIMARY KEY (user_id, symbol)
+                );
+            """)
+    
+        conn.commit()
@@ -0,0 +1,249 @@
+import argparse
+
+from psycopg2 import sql
+
+from app.db_core import DBCore
+
+
+class MigrationError(Exception):
+    """ Raised when a migration cannot be applied to the data currently in the database. """
+
+
+class Migration:
+    """ A versioned schema change. up holds the statements applying it, down the statements
+        reverting it. Migrations flagged concurrent build indexes without blocking writes,
+        which Postgres only allows outside a transaction. indexes names the indexes the
+        migration builds, and check is an optional function of a cursor that raises
+        MigrationError if the data would make the migration fail. """
+
+    def __init__(self, version, name, up, down, concurrent=False, indexes=(), check=None):
+        self.version = version
+        self.name = name
+        self.up = up
+        self.down = down
+        self.concurrent = concurrent
+        self.indexes = list(indexes)
+        self.check = check
+
+
+# duplicate emails listed in the error of a failed check
+DUPLICATE_EMAILS_SHOWN = 10
+
+
+def check_unique_emails(cur):
+    """ Accepts a cursor, raises MigrationError listing the emails used by several users
+        once case is ignored, which a unique index on lower(email) would reject. """
+
+    cur.execute("""
+        SELECT lower(email), array_agg(id ORDER BY id)
+        FROM users
+        GROUP BY lower(email)
+        HAVING COUNT(*) > 1
+        ORDER BY 1
+    """)
+
+    duplicates = cur.fetchall()
+    if not duplicates:
+        return
+
+    shown = "; ".join(f"{email} (users {', '.join(map(str, user_ids))})"
+                      for email, user_ids in duplicates[:DUPLICATE_EMAILS_SHOWN])
+    more = f" and {len(duplicates) - DUPLICATE_EMAILS_SHOWN} more" if len(duplicates) > DUPLICATE_EMAILS_SHOWN else ""
+    raise MigrationError(f"{len(duplicates)} emails belong to several users when case is ignored: "
+                         f"{shown}{more}. Merge or change them, then run the migrations again.")
+
+
+# every migration in order of version. never edit an applied migration, add a new one instead.
+MIGRATIONS = [
+    Migration(1, "positions user_id, symbol index", up=[
+        """ CREATE INDEX {concurrently} IF NOT EXISTS positions_user_id_symbol_idx
+            ON positions (user_id, symbol, position_id) """
+    ], down=[
+        """ DROP INDEX IF EXISTS positions_user_id_symbol_idx """
+    ], concurrent=True, indexes=["positions_user_id_symbol_idx"]),
+
+    Migration(2, "positions symbol index", up=[
+        """ CREATE INDEX {concurrently} IF NOT EXISTS positions_symbol_idx
+            ON positions (symbol) """
+    ], down=[
+        """ DROP INDEX IF EXISTS positions_symbol_idx """
+    ], concurrent=True, indexes=["positions_symbol_idx"]),
+
+    Migration(3, "trades_log user_id, date index", up=[
+        """ CREATE INDEX {concurrently} IF NOT EXISTS trades_log_user_id_date_idx
+            ON trades_log (user_id, date, trade_id) """
+    ], down=[
+        """ DROP INDEX IF EXISTS trades_log_user_id_date_idx """
+    ], concurrent=True, indexes=["trades_log_user_id_date_idx"]),
+
+    Migration(4, "transactions user_id, timestamp index", up=[
+        """ CREATE INDEX {concurrently} IF NOT EXISTS transactions_user_id_timestamp_idx
+            ON transactions (user_id, timestamp, transaction_id) """
+    ], down=[
+        """ DROP INDEX IF EXISTS transactions_user_id_timestamp_idx """
+    ], concurrent=True, indexes=["transactions_user_id_timestamp_idx"]),
+
+    Migration(5, "users unique lower(email) index", up=[
+        """ CREATE UNIQUE INDEX {concurrently} IF NOT EXISTS users_lower_email_idx
+            ON users (lower(email)) """
+    ], down=[
+        """ DROP INDEX IF EXISTS users_lower_email_idx """
+    ], concurrent=True, indexes=["users_lower_email_idx"], check=check_unique_emails)
+]
+
+
+def define_schema_migrations_table(cur):
+    """ Accepts a cursor, creates the table tracking which migrations have been applied. """
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations(
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+
+def get_applied_versions(cur):
+    """ Accepts a cursor, returns the set of applied migration versions. """
+
+    cur.execute(""" SELECT version FROM schema_migrations """)
+
+    return {version for (version,) in cur.fetchall()}
+
+
+def drop_invalid_indexes(cur, names, concurrently):
+    """ Accepts a cursor, index names and whether to drop concurrently. Drops any of the
+        indexes left INVALID by a failed concurrent build, which CREATE INDEX IF NOT EXISTS
+        would otherwise skip. Returns the names dropped. """
+
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = ANY(%s) AND pg_table_is_visible(c.oid) AND NOT i.indisvalid
+    """, (names,))
+
+    invalid = [name for (name,) in cur.fetchall()]
+    for name in invalid:
+        cur.execute(sql.SQL("DROP INDEX {concurrently} IF EXISTS {name}").format(
+            concurrently=sql.SQL("CONCURRENTLY" if concurrently else ""), name=sql.Identifier(name)))
+
+    return invalid
+
+
+def render(statement, concurrently):
+    """ Fills in the CONCURRENTLY keyword of a migration statement. """
+
+    return statement.format(concurrently="CONCURRENTLY" if concurrently else "")
+
+
+def apply_migration(conn, migration, concurrently=False):
+    """ Accepts a connection and migration, runs its up statements and records it as applied.
+        The migration's check runs first, and indexes left invalid by an earlier failed build
+        are dropped so they are built again. Concurrent index builds run in autocommit mode
+        and are then recorded in their own transaction, other migrations run and are
+        recorded in a single transaction. Raises MigrationError if the check fails. """
+
+    concurrently = concurrently and migration.concurrent
+
+    if migration.check is not None:
+        try:
+            with conn.cursor() as cur:
+                migration.check(cur)
+        except MigrationError as e:
+            conn.rollback()
+            raise MigrationError(f"Migration {migration.version} ({migration.name}) cannot be applied. {e}") from e
+        conn.commit()
+
+    if concurrently:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                drop_invalid_indexes(cur, migration.indexes, True)
+                for statement in migration.up:
+                    cur.execute(render(statement, True))
+        finally:
+            conn.autocommit = False
+
+    with conn.cursor() as cur:
+        if not concurrently:
+            drop_invalid_indexes(cur, migration.indexes, False)
+            for statement in migration.up:
+                cur.execute(render(statement, False))
+
+        cur.execute(""" INSERT INTO schema_migrations (version, name) VALUES (%s, %s) """,
+                    (migration.version, migration.name))
+
+    conn.commit()
+
+
+def revert_migration(conn, migration):
+    """ Accepts a connection and migration, runs its down statements and removes its record. """
+
+    with conn.cursor() as cur:
+        for statement in migration.down:
+            cur.execute(statement)
+
+        cur.execute(""" DELETE FROM schema_migrations WHERE version=%s """, (migration.version,))
+
+    conn.commit()
+
+
+def run_migrations(target_version=None, concurrently=False):
+    """ Applies every pending migration up to target_version (all by default), or reverts
+        applied migrations above it. Returns a list of the versions changed. """
+
+    changed = []
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor() as cur:
+            define_schema_migrations_table(cur)
+        conn.commit()
+
+        with conn.cursor() as cur:
+            applied = get_applied_versions(cur)
+        conn.commit()
+
+        if target_version is None:
+            target_version = max(m.version for m in MIGRATIONS)
+
+        # apply pending migrations in ascending order
+        for migration in MIGRATIONS:
+            if migration.version <= target_version and migration.version not in applied:
+                apply_migration(conn, migration, concurrently)
+                changed.append(migration.version)
+
+        # revert migrations above the target in descending order
+        for migration in reversed(MIGRATIONS):
+            if migration.version > target_version and migration.version in applied:
+                revert_migration(conn, migration)
+                changed.append(-migration.version)
+
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or revert schema migrations.")
+    parser.add_argument("--target", type=int, default=None,
+                        help="migrate to this version, reverting newer ones (default: latest)")
+    parser.add_argument("--concurrently", action="store_true",
+                        help="build indexes without blocking writes to the tables")
+    args = parser.parse_args()
+
+    try:
+        changed = run_migrations(args.target, args.concurrently)
+    except MigrationError as e:
+        print(e)
+        raise SystemExit(1)
+
+    if not changed:
+        print("Schema is up to date.")
+    for version in changed:
+        action = "Applied" if version > 0 else "Reverted"
+        migration = next(m for m in MIGRATIONS if m.version == abs(version))
+        print(f"{action} migration {migration.version}: {migration.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+from app.db_core import DBCore
+
+def define_portfolio_valuations_table():
+    """ Creates the table holding the latest valuation of every user's portfolio, written
+        by the bulk revaluation pass. """
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS portfolio_valuations(
+                    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+                    cash_balance NUMERIC(14, 2) NOT NULL,
+                    positions_value NUMERIC(14, 2) NOT NULL,
+                    cost_basis NUMERIC(14, 2) NOT NULL,
+                    portfolio_value NUMERIC(14, 2) NOT NULL,
+                    valued_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+
+        conn.commit()
@@ -0,0 +1,16 @@
+from app.db_core import DBCore
+
+def define_quotes_table():
+    """ Creates the table quotes, storing the latest price of every equity held by any user. """
+
+    with DBCore.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS quotes(
+                    symbol VARCHAR(20) PRIMARY KEY,
+                    price NUMERIC(10, 2) NOT NULL,
+                    as_of TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+    
+        conn.commit()
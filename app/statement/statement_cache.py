@@ -0,0 +1,173 @@
+import errno
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+# get directory of the app package
+APP_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# cache settings
+STATEMENT_CACHE_DIR = os.getenv("STATEMENT_CACHE_DIR", os.path.join(APP_DIR, "static", "pdfs", "cache"))
+STATEMENT_CACHE_MAX_BYTES = int(os.getenv("STATEMENT_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+STATEMENT_CACHE_MAX_AGE = float(os.getenv("STATEMENT_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+
+
+# cache keys name their owner and kind ahead of the digest, so any process can tell who may read them
+STATEMENT_KEY_PATTERN = re.compile(r"^(\d+)-([a-z]+)-[0-9a-f]{64}$")
+
+
+def statement_key(kind, user_id, start_date, end_date, fingerprint):
+    """ Accepts a statement kind, user_id, date range and a fingerprint of the statement's
+        rows, returns the key addressing the rendered statement in the cache, made of the
+        user_id, the kind and a hex digest of every input. """
+
+    payload = json.dumps([kind, user_id, str(start_date), str(end_date), fingerprint], default=str)
+    return f"{user_id}-{kind}-{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def parse_statement_key(key):
+    """ Accepts a cache key, returns its (user_id, kind), or None if it is not a valid key. """
+
+    match = STATEMENT_KEY_PATTERN.match(key or "")
+    if match is None:
+        return None
+    return int(match.group(1)), match.group(2)
+
+
+class StatementCache:
+    """ Directory of rendered statements named by the hash of their inputs, so an unchanged
+        statement is served without rendering it again. Files unused for max_age seconds are
+        removed, then the least recently used ones until the directory fits in max_bytes.
+        Statements still being rendered, or that failed, are recorded beside them in small
+        job files, so every process sharing the directory sees the same job states. """
+
+    def __init__(self, directory=STATEMENT_CACHE_DIR, max_bytes=STATEMENT_CACHE_MAX_BYTES,
+                 max_age=STATEMENT_CACHE_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key):
+        """ Accepts a cache key, returns the path of the cached statement or None. A hit
+            marks the file as recently used. """
+
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def _job_path(self, key):
+        return os.path.join(self.directory, f"{key}.job")
+
+    def set_job_state(self, key, status, error=None):
+        """ Accepts a cache key, job status and optionally an error, records them atomically. """
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._job_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+
+        with open(temp_path, "w") as file:
+            json.dump({"status": status, "error": error}, file)
+        os.replace(temp_path, path)
+
+    def get_job_state(self, key):
+        """ Accepts a cache key, returns the recorded job state as a dict with its status,
+            error and age in seconds, or None if no job is recorded. """
+
+        path = self._job_path(key)
+        try:
+            with open(path) as file:
+                state = json.load(file)
+            state["age"] = time.time() - os.path.getmtime(path)
+        except (OSError, ValueError):
+            return None
+        return state
+
+    def clear_job_state(self, key):
+        """ Accepts a cache key, forgets its recorded job state. """
+
+        try:
+            os.remove(self._job_path(key))
+        except OSError:
+            pass
+
+    def put(self, key, source_path):
+        """ Accepts a cache key and the path of a freshly rendered statement, moves the file
+            into the cache, evicts old files and returns the cached path. A file rendered on
+            another filesystem is copied to a temporary file in the cache first, so readers
+            never see a partly written statement. """
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+
+        try:
+            os.replace(source_path, path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+            try:
+                shutil.copyfile(source_path, temp_path)
+                os.replace(temp_path, path)
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            os.remove(source_path)
+
+        self.evict()
+        return path
+
+    def evict(self):
+        """ Removes statements and job files older than max_age, then least recently used
+            statements until the cache fits in max_bytes. Returns the number of files removed. """
+
+        with self._lock:
+            cutoff = time.time() - self.max_age
+            removed = 0
+
+            try:
+                entries = []
+                for entry in os.scandir(self.directory):
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    if entry.name.endswith(".pdf"):
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    elif entry.name.endswith(".job") and stat.st_mtime < cutoff:
+                        try:
+                            os.remove(entry.path)
+                            removed += 1
+                        except OSError:
+                            pass
+            except OSError:
+                return removed
+
+            entries.sort()
+            total = sum(size for mtime, size, path in entries)
+
+            for mtime, size, path in entries:
+                if mtime >= cutoff and total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+                total -= size
+
+            return removed
+
+
+STATEMENT_CACHE = StatementCache()
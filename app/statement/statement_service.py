@@ -0,0 +1,270 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.db_core import DBCore
+from app.position.position_repo import get_user_holdings
+from app.statement.statement_cache import STATEMENT_CACHE, parse_statement_key, statement_key
+from app.stock.stock_model import Stock
+from app.trade.trade_model import Trade
+from app.trade.trade_repo import get_trades_fingerprint, select_trades_for_export
+from app.transaction.transaction_model import Transaction
+from app.transaction.transaction_repo import get_transactions_fingerprint, select_transactions_for_export
+from app.user.user_repo import get_user_by_id
+from app.utils import parse_date_range
+
+# statement worker settings
+STATEMENT_WORKERS = int(os.getenv("STATEMENT_WORKERS", "2"))
+STATEMENT_JOB_TTL = float(os.getenv("STATEMENT_JOB_TTL", "3600"))
+
+# kinds of statement that can be rendered
+STATEMENT_KINDS = ("portfolio", "trades", "transactions")
+
+# job states
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+
+def statement_fingerprint(cur, kind, user_id, start_date, end_date):
+    """ Accepts cursor, statement kind, user_id and date range, returns a cheap summary of
+        the rows the statement would show, which changes whenever they do. """
+
+    if kind == "trades":
+        return get_trades_fingerprint(cur, user_id, start_date, end_date)
+    if kind == "transactions":
+        return get_transactions_fingerprint(cur, user_id, start_date, end_date)
+
+    # portfolio statements show the user, cash balance and every valued holding
+    user = get_user_by_id(cur, user_id)
+    holdings = get_user_holdings(cur, user_id)
+    return [user.first_name, user.last_name, str(user.cash_balance),
+            [(symbol, position.number_of_shares, round(position.price_per_share, 4),
+              round(position.last_price_per_share, 4)) for symbol, position in holdings.items()]]
+
+
+# rows fetched at a time while rendering trade and transaction statements
+STATEMENT_FETCH_SIZE = 2000
+
+
+def _stream_trades(cur, user_id):
+    """ Yields the rows selected on a named cursor as trade objects, one chunk at a time. """
+
+    for (trade_id, date, trade_type, symbol, company_name,
+         number_of_shares, price_per_share, trade_total) in cur:
+        stock = Stock(company_name=company_name, symbol=symbol, price=price_per_share)
+        yield Trade(user_id=user_id, stock=stock, number_of_shares=number_of_shares,
+                    trade_type=trade_type, trade_total=trade_total, trade_id=trade_id, timestamp=date)
+
+
+def _stream_transactions(cur, user_id):
+    """ Yields the rows selected on a named cursor as transaction objects, one chunk at a time. """
+
+    for (transaction_id, timestamp, transaction_type, amount) in cur:
+        yield Transaction(user_id=user_id, amount=amount, transaction_type=transaction_type,
+                          timestamp=timestamp, transaction_id=transaction_id)
+
+
+def render_statement(kind, user_id, start_date=None, end_date=None, key=None):
+    """ Accepts a statement kind, user_id, optionally a date range and the statement's cache
+        key, renders the statement to PDF and returns its path. Runs inside a worker process.
+        Trade and transaction rows stream from a server-side cursor into the low-memory PDF
+        mode, so memory use stays flat however long the history. The file is stored in the
+        statement cache if a key is provided. """
+
+    # imported here so only worker processes load reportlab
+    from app.pdf_generator import (
+        generate_portfolio_statement,
+        generate_trade_statement,
+        generate_transaction_statement
+    )
+
+    # render straight to a unique file name
+    filename = f"{key}.pdf" if key else None
+
+    if kind == "portfolio":
+        filepath = generate_portfolio_statement(user_id, filename)
+
+    else:
+        with DBCore.get_connection() as conn:
+            with conn.cursor(name=f"statement_{user_id}") as cur:
+                cur.itersize = STATEMENT_FETCH_SIZE
+
+                if kind == "trades":
+                    select_trades_for_export(cur, user_id, start_date, end_date, newest_first=True)
+                    filepath = generate_trade_statement(user_id, _stream_trades(cur, user_id), filename)
+                else:
+                    select_transactions_for_export(cur, user_id, start_date, end_date, newest_first=True)
+                    filepath = generate_transaction_statement(user_id, _stream_transactions(cur, user_id), filename)
+
+    return STATEMENT_CACHE.put(key, filepath) if key else filepath
+
+
+class StatementJob:
+    """ A statement queued for rendering, and its outcome. The job id is the statement's
+        cache key. """
+
+    def __init__(self, job_id, user_id, kind, status, filepath=None, error=None):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.kind = kind
+        self.status = status
+        self.filepath = filepath
+        self.error = error
+
+    def to_dict(self):
+        """ Returns the job's id, kind and status, and the error if rendering failed. """
+
+        job = {"job_id": self.job_id, "kind": self.kind, "status": self.status}
+        if self.status == FAILED:
+            job["error"] = self.error
+        return job
+
+
+class StatementQueue:
+    """ Renders PDF statements on a pool of worker processes, so web requests only enqueue
+        a job and return its id. Workers are spawned on first use and read their own rows
+        from the database. A job's id is the cache key of its statement, and its state is
+        kept in the statement cache directory, so any web process can report on it. Jobs
+        still pending job_ttl seconds after they were queued are reported as failed. """
+
+    def __init__(self, workers=STATEMENT_WORKERS, job_ttl=STATEMENT_JOB_TTL):
+        self.workers = workers
+        self.job_ttl = job_ttl
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # spawn rather than fork, the web process runs threads such as the quote refresher
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _submit(self, fn, *args):
+        """ Submits fn to the worker pool, replacing the pool if a worker died and broke it.
+            Called with the lock held. """
+
+        try:
+            return self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            return self._get_executor().submit(fn, *args)
+
+    def _finished(self, key, future):
+        """ Records the outcome of a render submitted by this process. """
+
+        with self._lock:
+            self._futures.pop(key, None)
+
+        error = future.exception()
+        if error is None:
+            STATEMENT_CACHE.clear_job_state(key)
+        else:
+            STATEMENT_CACHE.set_job_state(key, FAILED, str(error))
+
+    def submit(self, kind, user_id, start_date=None, end_date=None):
+        """ Accepts a statement kind, user_id and optionally a date range, returns the id of
+            a job producing the statement. Statements whose rows are unchanged since they were
+            last rendered complete at once from the statement cache, and a statement already
+            being rendered is not queued twice. Raises ValueError if the kind or a date is
+            invalid. """
+
+        if kind not in STATEMENT_KINDS:
+            raise ValueError(f"Unknown statement kind: {kind}.")
+        start_date, end_date = parse_date_range(start_date, end_date)
+
+        # address the statement by its inputs
+        with DBCore.get_connection() as conn:
+            with conn.cursor() as cur:
+                fingerprint = statement_fingerprint(cur, kind, user_id, start_date, end_date)
+        key = statement_key(kind, user_id, start_date, end_date, fingerprint)
+
+        with self._lock:
+            if STATEMENT_CACHE.get(key) or key in self._futures:
+                return key
+
+            # reuse a render another process is still working on
+            state = STATEMENT_CACHE.get_job_state(key)
+            if state and state["status"] == PENDING and state["age"] < self.job_ttl:
+                return key
+
+            STATEMENT_CACHE.set_job_state(key, PENDING)
+            try:
+                future = self._submit(render_statement, kind, user_id, start_date, end_date, key)
+            except Exception:
+                STATEMENT_CACHE.clear_job_state(key)
+                raise
+            self._futures[key] = future
+
+        # outside the lock, the callback runs at once if the render already finished
+        future.add_done_callback(lambda done: self._finished(key, done))
+        return key
+
+    def get(self, job_id, user_id):
+        """ Accepts a job id and user_id, returns the job if it belongs to the user, else None. """
+
+        parsed = parse_statement_key(job_id)
+        if parsed is None or parsed[0] != user_id or parsed[1] not in STATEMENT_KINDS:
+            return None
+        kind = parsed[1]
+
+        filepath = STATEMENT_CACHE.get(job_id)
+        if filepath:
+            return StatementJob(job_id, user_id, kind, DONE, filepath=filepath)
+
+        state = STATEMENT_CACHE.get_job_state(job_id)
+        if state is None:
+            return None
+        if state["status"] == FAILED:
+            return StatementJob(job_id, user_id, kind, FAILED, error=state["error"])
+        if state["age"] >= self.job_ttl:
+            return StatementJob(job_id, user_id, kind, FAILED, error="Statement rendering did not finish.")
+        return StatementJob(job_id, user_id, kind, PENDING)
+
+    def shutdown(self):
+        """ Stops the worker processes once their current jobs finish. """
+
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+STATEMENT_QUEUE = StatementQueue()
+
+
+def queue_statement(kind, user_id, start_date=None, end_date=None):
+    """ Accepts a statement kind, user_id and optionally a date range, queues the statement
+        for rendering in the background and returns the job id. """
+
+    try:
+        job_id = STATEMENT_QUEUE.submit(kind, user_id, start_date, end_date)
+        return {
+            "success": True,
+            "message": job_id
+        }
+
+    except ValueError as e:
+        return {
+            "success": False,
+            "message": f"Invalid statement request: {e}"
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error. Failed to queue statement: {e}."
+        }
+
+
+def get_statement_job(job_id, user_id):
+    """ Accepts a job id and user_id, returns the user's statement job, or None if there is
+        no such job. """
+
+    return STATEMENT_QUEUE.get(job_id, user_id)
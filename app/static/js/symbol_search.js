@@ -0,0 +1,42 @@
+// typeahead for the ticker search input, fills a datalist from /search_symbols
+(function () {
+  const input = document.getElementById("ticker");
+  const list = document.getElementById("ticker_suggestions");
+  if (!input || !list) {
+    return;
+  }
+
+  let timer = null;
+  let controller = null;
+
+  input.addEventListener("input", function () {
+    clearTimeout(timer);
+    const query = input.value.trim();
+
+    if (query.length < 1) {
+      list.innerHTML = "";
+      return;
+    }
+
+    // wait for a short pause in typing before searching
+    timer = setTimeout(function () {
+      if (controller) {
+        controller.abort();
+      }
+      controller = new AbortController();
+
+      fetch("/search_symbols?q=" + encodeURIComponent(query), { signal: controller.signal })
+        .then(function (response) { return response.json(); })
+        .then(function (results) {
+          list.innerHTML = "";
+          results.forEach(function (result) {
+            const option = document.createElement("option");
+            option.value = result.symbol;
+            option.label = result.name ? result.symbol + " – " + result.name : result.symbol;
+            list.appendChild(option);
+          });
+        })
+        .catch(function () {});
+    }, 120);
+  });
+})();
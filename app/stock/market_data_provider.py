@@ -0,0 +1,190 @@
+import csv
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from yfinance import Ticker
+from app.stock.stock_model import Stock
+
+# market data settings
+MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yfinance")
+MARKET_DATA_SEED = int(os.getenv("MARKET_DATA_SEED", "42"))
+MARKET_DATA_TICK_SECONDS = float(os.getenv("MARKET_DATA_TICK_SECONDS", "1"))
+MARKET_DATA_REPLAY_FILE = os.getenv("MARKET_DATA_REPLAY_FILE", "")
+
+# ticks between the cached checkpoints of a synthetic path, a power of two so halving reaches every tick
+SYNTHETIC_CHECKPOINT_TICKS = 2 ** 16
+
+
+class MarketDataProvider:
+    """ Interface of a source of live stock data. Symbols are passed in uppercase. """
+
+    def get_stock(self, symbol):
+        """ Accepts a symbol, returns a Stock object with the company name and live price. """
+        raise NotImplementedError
+
+    def get_price(self, symbol):
+        """ Accepts a symbol, returns its live price as a float. """
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """ Live stock data from Yahoo Finance. """
+
+    def get_stock(self, symbol):
+        data = Ticker(symbol).info
+        return Stock(data["shortName"], symbol, data["regularMarketPrice"])
+
+    def get_price(self, symbol):
+        return Ticker(symbol).fast_info["lastPrice"]
+
+
+class SyntheticProvider(MarketDataProvider):
+    """ Deterministic offline prices following a geometric Brownian motion per symbol. The
+        price of a symbol depends only on the seed, the symbol and the number of ticks of
+        tick_seconds since the provider started, never on when it was quoted before, so runs
+        with the same seed see the same prices. Each tick has its own seeded normal draw. The
+        motion is summed once per checkpoint of SYNTHETIC_CHECKPOINT_TICKS ticks, and a tick
+        between checkpoints is reached by halving the interval around it as a Brownian bridge,
+        so a quote costs a few draws however many ticks have passed. """
+
+    def __init__(self, seed=MARKET_DATA_SEED, tick_seconds=MARKET_DATA_TICK_SECONDS,
+                 drift=0.05, volatility=0.3, clock=time.time):
+        self.seed = seed
+        self.tick_seconds = tick_seconds
+        self.clock = clock
+        self._start_tick = self._current_tick()
+
+        # per step drift and volatility, annualised over one trading year of ticks
+        dt = tick_seconds / (252 * 6.5 * 3600)
+        self._step_drift = (drift - volatility ** 2 / 2) * dt
+        self._step_volatility = volatility * math.sqrt(dt)
+
+        # symbol -> [starting price, motion at each checkpoint, lock of the path]
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    def _current_tick(self):
+        return int(self.clock() / self.tick_seconds)
+
+    def _new_path(self, symbol):
+        """ Accepts a symbol, returns its seeded starting price, first checkpoint and lock. """
+
+        rng = random.Random(self.seed ^ zlib.crc32(symbol.encode()))
+        price = round(rng.uniform(5, 500), 2)
+        return [price, [0.0], threading.Lock()]
+
+    def _draw(self, symbol, tick):
+        """ Returns the standard normal draw of one tick of a symbol's path, seeded by a
+            string so it is the same in every process and run. """
+
+        return random.Random(f"{self.seed}:{symbol}:{tick}").gauss(0, 1)
+
+    def _motion(self, symbol, path, tick):
+        """ Accepts a symbol, its path and a tick, returns the Brownian motion of the path at
+            that tick, extending the cached checkpoints up to it. """
+
+        block, offset = divmod(tick, SYNTHETIC_CHECKPOINT_TICKS)
+
+        with path[2]:
+            checkpoints = path[1]
+            while len(checkpoints) < block + 2:
+                checkpoints.append(checkpoints[-1] + math.sqrt(SYNTHETIC_CHECKPOINT_TICKS) *
+                                   self._draw(symbol, len(checkpoints) * SYNTHETIC_CHECKPOINT_TICKS))
+            low_motion, high_motion = checkpoints[block], checkpoints[block + 1]
+
+        # halve the interval around the tick, drawing each midpoint from the bridge between its ends
+        low = block * SYNTHETIC_CHECKPOINT_TICKS
+        high = low + SYNTHETIC_CHECKPOINT_TICKS
+        while low < tick:
+            mid = (low + high) // 2
+            mid_motion = ((low_motion + high_motion) / 2 +
+                          math.sqrt((high - low) / 4) * self._draw(symbol, mid))
+            if tick < mid:
+                high, high_motion = mid, mid_motion
+            else:
+                low, low_motion = mid, mid_motion
+
+        return low_motion
+
+    def get_price(self, symbol):
+        tick = max(self._current_tick() - self._start_tick, 0)
+
+        # the provider-wide lock only guards creating paths
+        with self._lock:
+            path = self._paths.get(symbol)
+            if path is None:
+                path = self._paths[symbol] = self._new_path(symbol)
+
+        motion = self._motion(symbol, path, tick)
+        return round(path[0] * math.exp(tick * self._step_drift + self._step_volatility * motion), 2)
+
+    def get_stock(self, symbol):
+        return Stock(f"{symbol} synthetic", symbol, self.get_price(symbol))
+
+
+class ReplayProvider(MarketDataProvider):
+    """ Replays recorded quotes from a CSV file with the columns symbol, price and optionally
+        company_name. Each symbol's recorded prices are served in file order, one per tick,
+        starting over once the end is reached. """
+
+    def __init__(self, path=MARKET_DATA_REPLAY_FILE, tick_seconds=MARKET_DATA_TICK_SECONDS,
+                 clock=time.time):
+        self.tick_seconds = tick_seconds
+        self.clock = clock
+        self._start_tick = int(clock() / tick_seconds)
+        self._prices = {}
+        self._names = {}
+
+        with open(path, newline="") as file:
+            for row in csv.DictReader(file):
+                symbol = row["symbol"].strip().upper()
+                self._prices.setdefault(symbol, []).append(float(row["price"]))
+                if row.get("company_name"):
+                    self._names[symbol] = row["company_name"]
+
+    def get_price(self, symbol):
+        prices = self._prices.get(symbol)
+        if not prices:
+            raise KeyError(f"No recorded quotes for {symbol}.")
+
+        tick = int(self.clock() / self.tick_seconds) - self._start_tick
+        return prices[tick % len(prices)]
+
+    def get_stock(self, symbol):
+        return Stock(self._names.get(symbol, symbol), symbol, self.get_price(symbol))
+
+
+def create_provider(name=MARKET_DATA_PROVIDER):
+    """ Accepts the name of a provider (yfinance, synthetic or replay), returns an instance
+        configured from the environment. """
+
+    if name == "yfinance":
+        return YFinanceProvider()
+    if name == "synthetic":
+        return SyntheticProvider()
+    if name == "replay":
+        return ReplayProvider()
+
+    raise ValueError(f"Unknown market data provider: {name}.")
+
+
+_provider = None
+
+
+def get_provider():
+    """ Returns the market data provider selected by MARKET_DATA_PROVIDER. """
+
+    global _provider
+    if _provider is None:
+        _provider = create_provider()
+    return _provider
+
+
+def set_provider(provider):
+    """ Replaces the market data provider, e.g. with a SyntheticProvider for benchmarks. """
+
+    global _provider
+    _provider = provider
@@ -1,46 +1,236 @@
-from yfinance import Ticker
-from app.stock.stock_model import Stock
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from app.stock.market_data_provider import get_provider
+
+# quote cache settings
+QUOTE_CACHE_TTL = float(os.getenv("QUOTE_CACHE_TTL", "15"))
+QUOTE_CACHE_MAX_SIZE = int(os.getenv("QUOTE_CACHE_MAX_SIZE", "2048"))
+
+# batch quote settings
+QUOTE_BATCH_WORKERS = int(os.getenv("QUOTE_BATCH_WORKERS", "8"))
+QUOTE_BATCH_TIMEOUT = float(os.getenv("QUOTE_BATCH_TIMEOUT", "10"))
+
+
+class _InFlight:
+    """ A fetch in progress, shared by every caller asking for the same key. """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QuoteCache:
+    """ Thread-safe LRU cache of quotes with a per-entry time to live. Concurrent misses
+        for the same key share one fetch. """
+
+    def __init__(self, ttl=QUOTE_CACHE_TTL, max_size=QUOTE_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "fetches": 0,
+            "fetch_errors": 0,
+            "fetch_time": 0.0,
+            "max_fetch_time": 0.0,
+            "evictions": 0
+        }
+
+    def _lookup(self, key):
+        """ Returns the fresh cached value of key or None. Caller must hold the lock. """
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value):
+        """ Stores value under key, evicting the least recently used entries. Caller must
+            hold the lock. """
+
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def put(self, key, value):
+        """ Stores a value fetched elsewhere. """
+
+        with self._lock:
+            self._store(key, value)
+
+    def get(self, key, loader):
+        """ Accepts a key and a callable fetching its value. Returns the cached value if it
+            is fresh, otherwise fetches it once, even if many threads ask at the same time.
+            Errors raised by loader are passed to every waiting caller and not cached. """
+
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                self._stats["hits"] += 1
+                return value
+
+            self._stats["misses"] += 1
+
+            # join a fetch already in progress for this key
+            in_flight = self._in_flight.get(key)
+            if in_flight is not None:
+                self._stats["coalesced"] += 1
+                owner = False
+            else:
+                in_flight = self._in_flight[key] = _InFlight()
+                owner = True
+
+        if not owner:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.value
+
+        # fetch outside the lock
+        start = time.perf_counter()
+        try:
+            in_flight.value = loader()
+        except Exception as e:
+            in_flight.error = e
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._stats["fetches"] += 1
+            self._stats["fetch_time"] += elapsed
+            self._stats["max_fetch_time"] = max(self._stats["max_fetch_time"], elapsed)
+
+            if in_flight.error is None and in_flight.value is not None:
+                self._store(key, in_flight.value)
+            else:
+                self._stats["fetch_errors"] += 1
+
+            del self._in_flight[key]
+
+        in_flight.done.set()
+
+        if in_flight.error is not None:
+            raise in_flight.error
+        return in_flight.value
+
+    def clear(self):
+        """ Removes every cached entry. """
+
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """ Returns a dict of hit, miss and fetch latency counters. """
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            stats["avg_fetch_time"] = stats["fetch_time"] / stats["fetches"] if stats["fetches"] else 0.0
+            return stats
+
+
+QUOTE_CACHE = QuoteCache()
+
+# bounded pool shared by every batch quote request
+_QUOTE_EXECUTOR = ThreadPoolExecutor(max_workers=QUOTE_BATCH_WORKERS, thread_name_prefix="quotes")
+
+
+def _fetch_stock(symbol):
+    """ Accepts an uppercase stock symbol, fetches live stock data from the market data
+        provider and returns stock object. Also caches the live price so live_stock_price
+        can reuse it. """
+
+    stock = get_provider().get_stock(symbol)
+
+    QUOTE_CACHE.put(("price", symbol), stock.price)
+    return stock
+
+
+def _fetch_live_price(symbol):
+    """ Accepts an uppercase stock symbol, returns its live price from the market data provider. """
+
+    return get_provider().get_price(symbol)
 
 
 # tested, functional, commented
 def create_stock(symbol):
     """ Accepts a stock symbol, fetches live stock data and returns stock object. """
-    
+
     try:
-        
-        # format and retrieve data
+
+        # format and retrieve data, served from the quote cache while fresh
         symbol = symbol.upper()
-        data = Ticker(symbol).info
-        price = data["regularMarketPrice"]
+        return QUOTE_CACHE.get(("stock", symbol), lambda: _fetch_stock(symbol))
 
-        company_name = data["shortName"]
-        
-        return Stock(company_name, symbol, price)
-    
     except Exception as e:
         return None
-    
+
+
+def _fetch_batch(fetch, symbols, timeout):
+    """ Accepts a single-symbol fetch function, a list of symbols and a timeout in seconds.
+        Runs the fetches concurrently on the shared quote pool and returns a dictionary of
+        the results that completed successfully before the deadline. Symbols that failed or
+        timed out are left out. """
+
+    futures = {}
+    for symbol in dict.fromkeys(symbols):
+        futures[_QUOTE_EXECUTOR.submit(fetch, symbol)] = symbol
+
+    # wait for the whole batch up to the deadline
+    done, _ = wait(futures, timeout=timeout)
+
+    results = {}
+    for future in done:
+        if future.exception() is None and future.result() is not None:
+            results[futures[future]] = future.result()
+
+    return results
+
 
 # tested, functional, commented
-def create_stocks(symbols):
+def create_stocks(symbols, timeout=QUOTE_BATCH_TIMEOUT):
     """ Accepts a list of stock symbols, returns a dictionary with stock symbols as keys and stock objects
-        as values. """
-    
-    stocks = {}
+        as values. Symbols are fetched concurrently, any that fail or miss the deadline map to None. """
+
+    stocks = _fetch_batch(create_stock, symbols, timeout)
 
-    for symbol in symbols:
-        stocks[symbol] = create_stock(symbol)
-    
-    return stocks
+    return {symbol: stocks.get(symbol) for symbol in symbols}
 
 
-# tested, functional, commented 
+# tested, functional, commented
 def live_stock_price(symbol):
     """ Accepts a symbol of equity and returns a live price from the API. """
 
-    return Ticker(symbol).fast_info["lastPrice"]
+    symbol = symbol.upper()
+    return QUOTE_CACHE.get(("price", symbol), lambda: _fetch_live_price(symbol))
+
+
+def live_stock_prices(symbols, timeout=QUOTE_BATCH_TIMEOUT):
+    """ Accepts a list of symbols of equities, fetches their live prices concurrently and
+        returns a dictionary with symbols as keys and prices as values. Symbols whose price
+        could not be fetched before the deadline are left out. """
 
+    return _fetch_batch(live_stock_price, symbols, timeout)
 
 
-    
+def quote_cache_stats():
+    """ Returns hit/miss and fetch latency counters of the quote cache. """
 
+    return QUOTE_CACHE.stats()
@@ -26,22 +26,321 @@ def log_trade(cur, trade):
         ))
     return cur.rowcount > 0
 
+def execute_buy(cur, trade, position):
+    """ Accepts cursor, a BUY trade object and the position object it opens. In a single
+        statement, debits the trade total from the user's cash balance only if the balance
+        covers it, logs the trade, logs the position, adds it to the user's holding and
+        records the price as the symbol's latest quote. Returns the new trade_id, or None
+        if the user has insufficient funds. """
+
+    cur.execute("""
+        WITH debit AS (
+            UPDATE users SET cash_balance = cash_balance - %(trade_total)s
+            WHERE id = %(user_id)s AND cash_balance >= %(trade_total)s
+            RETURNING id
+        ), trade AS (
+            INSERT INTO trades_log (user_id, company_name, symbol, price_per_share,
+                                    number_of_shares, trade_total, trade_type)
+            SELECT id, %(company_name)s, %(symbol)s, %(price_per_share)s,
+                   %(number_of_shares)s, %(trade_total)s, 'BUY'
+            FROM debit
+            RETURNING trade_id
+        ), lot AS (
+            INSERT INTO positions (user_id, company_name, symbol, number_of_shares,
+                                   average_price_per_share, last_price_per_share, position_total)
+            SELECT id, %(company_name)s, %(symbol)s, %(number_of_shares)s,
+                   %(price_per_share)s, %(last_price_per_share)s, %(position_total)s
+            FROM debit
+        ), holding AS (
+            INSERT INTO holdings (user_id, symbol, company_name, shares, cost_basis)
+            SELECT id, %(symbol)s, %(company_name)s, %(number_of_shares)s,
+                   %(number_of_shares)s * ROUND(%(price_per_share)s::numeric, 2)
+            FROM debit
+            ON CONFLICT (user_id, symbol) DO UPDATE SET
+                shares = holdings.shares + EXCLUDED.shares,
+                cost_basis = holdings.cost_basis + EXCLUDED.cost_basis
+        ), quote AS (
+            INSERT INTO quotes (symbol, price, as_of)
+            SELECT %(symbol)s, %(price_per_share)s, CURRENT_TIMESTAMP
+            FROM debit
+            ON CONFLICT (symbol) DO UPDATE SET price=EXCLUDED.price, as_of=EXCLUDED.as_of
+        )
+        SELECT trade_id FROM trade
+    """, {
+        "user_id": trade.user_id,
+        "company_name": trade.company_name,
+        "symbol": trade.symbol,
+        "price_per_share": trade.price_per_share,
+        "number_of_shares": trade.number_of_shares,
+        "trade_total": trade.trade_total,
+        "last_price_per_share": position.last_price_per_share,
+        "position_total": position.total_value
+    })
+
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def execute_sell(cur, user_id, stock, number_of_shares):
+    """ Accepts cursor, user_id, live stock object and number of shares to sell. In a single
+        statement, consumes the user's positions of the equity in position_id order (FIFO),
+        closing fully sold positions and reducing the last one, logs one SELL trade per
+        position consumed, takes the sold shares and their cost off the user's holding,
+        credits the proceeds to the user's cash balance and records the price as the
+        symbol's latest quote. Returns the list of trade objects produced, which is empty
+        if the user holds fewer shares than requested. """
+
+    cur.execute("""
+        WITH locked AS (
+            SELECT position_id, number_of_shares, average_price_per_share
+            FROM positions
+            WHERE user_id = %(user_id)s AND symbol = %(symbol)s
+            ORDER BY position_id
+            FOR UPDATE
+        ), lots AS (
+            SELECT position_id, number_of_shares, average_price_per_share,
+                   SUM(number_of_shares) OVER (ORDER BY position_id) - number_of_shares AS shares_before
+            FROM locked
+        ), consumed AS (
+            SELECT position_id, number_of_shares, average_price_per_share,
+                   LEAST(number_of_shares, %(number_of_shares)s - shares_before) AS sold
+            FROM lots
+            WHERE shares_before < %(number_of_shares)s
+              AND (SELECT SUM(number_of_shares) FROM locked) >= %(number_of_shares)s
+        ), closed AS (
+            DELETE FROM positions
+            USING consumed
+            WHERE positions.position_id = consumed.position_id
+              AND consumed.sold = consumed.number_of_shares
+        ), reduced AS (
+            UPDATE positions SET
+                number_of_shares = positions.number_of_shares - consumed.sold,
+                last_price_per_share = %(price)s,
+                position_total = (positions.number_of_shares - consumed.sold) * %(price)s
+            FROM consumed
+            WHERE positions.position_id = consumed.position_id
+              AND consumed.sold < consumed.number_of_shares
+        ), trades AS (
+            INSERT INTO trades_log (user_id, company_name, symbol, price_per_share,
+                                    number_of_shares, trade_total, trade_type)
+            SELECT %(user_id)s, %(company_name)s, %(symbol)s, %(price)s,
+                   sold, ROUND(sold * %(price)s, 2), 'SELL'
+            FROM consumed
+            ORDER BY position_id
+            RETURNING trade_id, date, number_of_shares, trade_total
+        ), sold_holding AS (
+            SELECT SUM(sold) AS shares, SUM(sold * average_price_per_share) AS cost FROM consumed
+        ), emptied AS (
+            DELETE FROM holdings
+            USING sold_holding
+            WHERE holdings.user_id = %(user_id)s AND holdings.symbol = %(symbol)s
+              AND holdings.shares = sold_holding.shares
+        ), held AS (
+            UPDATE holdings SET
+                shares = holdings.shares - sold_holding.shares,
+                cost_basis = holdings.cost_basis - sold_holding.cost
+            FROM sold_holding
+            WHERE holdings.user_id = %(user_id)s AND holdings.symbol = %(symbol)s
+              AND holdings.shares > sold_holding.shares
+        ), credit AS (
+            UPDATE users SET cash_balance = cash_balance +
+                (SELECT SUM(ROUND(sold * %(price)s, 2)) FROM consumed)
+            WHERE id = %(user_id)s AND EXISTS (SELECT 1 FROM consumed)
+        ), quote AS (
+            INSERT INTO quotes (symbol, price, as_of)
+            SELECT %(symbol)s, %(price)s, CURRENT_TIMESTAMP
+            WHERE EXISTS (SELECT 1 FROM consumed)
+            ON CONFLICT (symbol) DO UPDATE SET price=EXCLUDED.price, as_of=EXCLUDED.as_of
+        )
+        SELECT trade_id, date, number_of_shares, trade_total FROM trades ORDER BY trade_id
+    """, {
+        "user_id": user_id,
+        "symbol": stock.symbol,
+        "company_name": stock.company_name,
+        "price": round(stock.price, 2),
+        "number_of_shares": number_of_shares
+    })
+
+    trades_list = []
+    for (trade_id, date, shares_sold, trade_total) in cur.fetchall():
+        trades_list.append(Trade(user_id=user_id, stock=stock, number_of_shares=shares_sold,
+                                 trade_type="SELL", trade_total=trade_total,
+                                 trade_id=trade_id, timestamp=date))
+
+    return trades_list
+
+
+def execute_basket_sells(cur, user_id, orders):
+    """ Accepts cursor, user_id and a list of (stock, number_of_shares) sell orders of
+        distinct symbols. In a single statement, consumes the user's positions of every
+        symbol FIFO, closing fully sold positions and reducing the last one, takes the sold
+        shares off the user's holdings and logs one SELL trade per position consumed. Cash
+        is NOT credited. Returns a dictionary with symbols as keys and (shares sold,
+        proceeds) tuples as values, symbols with fewer shares held than requested sell
+        nothing. """
+
+    if not orders:
+        return {}
+
+    cur.execute("""
+        WITH orders AS (
+            SELECT * FROM unnest(%(symbols)s::text[], %(company_names)s::text[],
+                                 %(prices)s::numeric[], %(shares)s::integer[])
+                AS o(symbol, company_name, price, number_of_shares)
+        ), locked AS (
+            SELECT position_id, symbol, number_of_shares, average_price_per_share
+            FROM positions
+            WHERE user_id = %(user_id)s AND symbol IN (SELECT symbol FROM orders)
+            ORDER BY position_id
+            FOR UPDATE
+        ), lots AS (
+            SELECT position_id, symbol, number_of_shares, average_price_per_share,
+                   SUM(number_of_shares) OVER (PARTITION BY symbol ORDER BY position_id) - number_of_shares AS shares_before,
+                   SUM(number_of_shares) OVER (PARTITION BY symbol) AS shares_held
+            FROM locked
+        ), consumed AS (
+            SELECT lots.position_id, lots.symbol, lots.number_of_shares, lots.average_price_per_share,
+                   o.company_name, o.price,
+                   LEAST(lots.number_of_shares, o.number_of_shares - lots.shares_before) AS sold
+            FROM lots
+            JOIN orders o ON o.symbol = lots.symbol
+            WHERE lots.shares_before < o.number_of_shares
+              AND lots.shares_held >= o.number_of_shares
+        ), closed AS (
+            DELETE FROM positions
+            USING consumed
+            WHERE positions.position_id = consumed.position_id
+              AND consumed.sold = consumed.number_of_shares
+        ), reduced AS (
+            UPDATE positions SET
+                number_of_shares = positions.number_of_shares - consumed.sold,
+                last_price_per_share = consumed.price,
+                position_total = (positions.number_of_shares - consumed.sold) * consumed.price
+            FROM consumed
+            WHERE positions.position_id = consumed.position_id
+              AND consumed.sold < consumed.number_of_shares
+        ), sold_holdings AS (
+            SELECT symbol, SUM(sold) AS shares, SUM(sold * average_price_per_share) AS cost
+            FROM consumed
+            GROUP BY symbol
+        ), emptied AS (
+            DELETE FROM holdings
+            USING sold_holdings
+            WHERE holdings.user_id = %(user_id)s AND holdings.symbol = sold_holdings.symbol
+              AND holdings.shares = sold_holdings.shares
+        ), held AS (
+            UPDATE holdings SET
+                shares = holdings.shares - sold_holdings.shares,
+                cost_basis = holdings.cost_basis - sold_holdings.cost
+            FROM sold_holdings
+            WHERE holdings.user_id = %(user_id)s AND holdings.symbol = sold_holdings.symbol
+              AND holdings.shares > sold_holdings.shares
+        ), trades AS (
+            INSERT INTO trades_log (user_id, company_name, symbol, price_per_share,
+                                    number_of_shares, trade_total, trade_type)
+            SELECT %(user_id)s, company_name, symbol, price,
+                   sold, ROUND(sold * price, 2), 'SELL'
+            FROM consumed
+            ORDER BY position_id
+            RETURNING symbol, number_of_shares, trade_total
+        )
+        SELECT symbol, SUM(number_of_shares), SUM(trade_total) FROM trades GROUP BY symbol
+    """, {
+        "user_id": user_id,
+        "symbols": [stock.symbol for stock, number_of_shares in orders],
+        "company_names": [stock.company_name for stock, number_of_shares in orders],
+        "prices": [round(stock.price, 2) for stock, number_of_shares in orders],
+        "shares": [number_of_shares for stock, number_of_shares in orders]
+    })
+
+    return {symbol: (int(shares_sold), float(proceeds)) for (symbol, shares_sold, proceeds) in cur.fetchall()}
+
+
+def execute_basket_buys(cur, user_id, orders):
+    """ Accepts cursor, user_id and a list of (stock, number_of_shares) buy orders. In a
+        single statement, logs a BUY trade and opens a position for every order and adds
+        them to the user's holdings. Cash is NOT debited. Returns the list of new trade_ids
+        in order of the orders. """
+
+    if not orders:
+        return []
+
+    cur.execute("""
+        WITH orders AS (
+            SELECT * FROM unnest(%(symbols)s::text[], %(company_names)s::text[],
+                                 %(prices)s::numeric[], %(shares)s::integer[])
+                WITH ORDINALITY AS o(symbol, company_name, price, number_of_shares, leg)
+        ), lots AS (
+            INSERT INTO positions (user_id, company_name, symbol, number_of_shares,
+                                   average_price_per_share, last_price_per_share, position_total)
+            SELECT %(user_id)s, company_name, symbol, number_of_shares,
+                   price, price, ROUND(number_of_shares * price, 2)
+            FROM orders
+            ORDER BY leg
+        ), holding AS (
+            INSERT INTO holdings (user_id, symbol, company_name, shares, cost_basis)
+            SELECT %(user_id)s, symbol, MIN(company_name), SUM(number_of_shares),
+                   SUM(number_of_shares * ROUND(price, 2))
+            FROM orders
+            GROUP BY symbol
+            ON CONFLICT (user_id, symbol) DO UPDATE SET
+                shares = holdings.shares + EXCLUDED.shares,
+                cost_basis = holdings.cost_basis + EXCLUDED.cost_basis
+        ), trades AS (
+            INSERT INTO trades_log (user_id, company_name, symbol, price_per_share,
+                                    number_of_shares, trade_total, trade_type)
+            SELECT %(user_id)s, company_name, symbol, price,
+                   number_of_shares, ROUND(number_of_shares * price, 2), 'BUY'
+            FROM orders
+            ORDER BY leg
+            RETURNING trade_id
+        )
+        SELECT trade_id FROM trades ORDER BY trade_id
+    """, {
+        "user_id": user_id,
+        "symbols": [stock.symbol for stock, number_of_shares in orders],
+        "company_names": [stock.company_name for stock, number_of_shares in orders],
+        "prices": [round(stock.price, 2) for stock, number_of_shares in orders],
+        "shares": [number_of_shares for stock, number_of_shares in orders]
+    })
+
+    return [trade_id for (trade_id,) in cur.fetchall()]
+
+
 # tested, functional, commented
-def get_trades(cur, user_id, start_date, end_date):
+def get_trades(cur, user_id, start_date, end_date, limit=None, after=None):
     """ Accepts cursor, user_id and returns list of user's trades as
-        trade objects. If user has not performed any trades, will return
+        trade objects, newest first. If user has not performed any trades, will return
         and empty list. If start and end date are provided, will filter 
-        results to those dates. """
+        results to those dates. If limit is provided, returns at most limit trades
+        older than the (date, trade_id) keyset after, so that every page is a bounded
+        range scan of the trades_log (user_id, date, trade_id) index. """
+
+    conditions = ["user_id = %s"]
+    params = [user_id]
 
     # take path depending on whether start and end date were provided
     if start_date and end_date:
-        cur.execute(""" SELECT * FROM trades_log 
-            WHERE user_id = %s AND date >= %s AND date <= %s
-            ORDER BY date DESC
-        """, (user_id, start_date, end_date)
-        )
-    else:
-        cur.execute(""" SELECT * FROM trades_log WHERE user_id=%s ORDER BY date DESC """, (user_id,))
+        conditions.append("date >= %s AND date <= %s")
+        params.extend([start_date, end_date])
+
+    # continue after the last trade of the previous page
+    if after:
+        conditions.append("(date, trade_id) < (%s, %s)")
+        params.extend(after)
+
+    limit_clause = ""
+    if limit:
+        limit_clause = "LIMIT %s"
+        params.append(limit)
+
+    where_clause = " AND ".join(conditions)
+
+    cur.execute(f""" SELECT * FROM trades_log
+        WHERE {where_clause}
+        ORDER BY date DESC, trade_id DESC
+        {limit_clause}
+    """, params)
 
     rows = cur.fetchall()
     trades_list = []
@@ -64,3 +363,41 @@ def get_trades(cur, user_id, start_date, end_date):
         
     return trades_list
 
+
+def get_trades_fingerprint(cur, user_id, start_date, end_date):
+    """ Accepts cursor, user_id and optionally start and end dates, returns the number and
+        the largest trade_id of the user's trades in that period. Trades are never edited,
+        so the pair changes whenever the period's trades do. """
+
+    if start_date and end_date:
+        cur.execute(""" SELECT COUNT(*), MAX(trade_id) FROM trades_log
+            WHERE user_id = %s AND date >= %s AND date <= %s
+        """, (user_id, start_date, end_date))
+    else:
+        cur.execute(""" SELECT COUNT(*), MAX(trade_id) FROM trades_log WHERE user_id = %s """, (user_id,))
+
+    return tuple(cur.fetchone())
+
+
+# columns of an exported trade, in export order
+TRADE_EXPORT_COLUMNS = ["trade_id", "date", "trade_type", "symbol", "company_name",
+                        "number_of_shares", "price_per_share", "trade_total"]
+
+
+def select_trades_for_export(cur, user_id, start_date, end_date, newest_first=False):
+    """ Accepts a (named, server-side) cursor, user_id and optionally start and end dates,
+        executes the query selecting the user's trades oldest first, or newest first if
+        newest_first is set. Rows are left on the cursor for the caller to fetch in chunks. """
+
+    columns = ", ".join(TRADE_EXPORT_COLUMNS)
+    direction = "DESC" if newest_first else "ASC"
+
+    if start_date and end_date:
+        cur.execute(f""" SELECT {columns} FROM trades_log
+            WHERE user_id = %s AND date >= %s AND date <= %s
+            ORDER BY date {direction}, trade_id {direction}
+        """, (user_id, start_date, end_date))
+    else:
+        cur.execute(f""" SELECT {columns} FROM trades_log
+            WHERE user_id = %s ORDER BY date {direction}, trade_id {direction}
+        """, (user_id,))
@@ -1,86 +1,78 @@
 from app.db_core import DBCore
+from app.portfolio.portfolio_cache import invalidate_portfolio
 from app.position.position_model import Position
-from app.stock.stock_service import create_stock
+from app.stock.stock_service import create_stock, create_stocks
 from datetime import datetime, timedelta
 from app.trade.trade_model import Trade
+from app.exchange_data.symbol_index import ALL_SYMBOLS
+from app.position.position_repo import get_user_holdings
+from app.quote.quote_repo import upsert_quotes
+from app.utils import valid_num_shares, encode_page_cursor, decode_page_cursor
+import os
 
 from app.trade.trade_repo import (
-    log_trade,
-    get_trades
-)
-
-from app.position.position_repo import (
-    get_user_positions_of_equity,
-    log_position,
-    close_position,
-    update_position,
-    update_positions_last_price
+    get_trades,
+    execute_buy,
+    execute_sell,
+    execute_basket_buys,
+    execute_basket_sells
 )
 from app.user.user_repo import (
+    lock_user_orders,
     get_user_by_id,
-    update_user_cash_balance
+    adjust_user_cash_balance
 )
 
+# maximum number of legs accepted in one basket order
+BASKET_MAX_LEGS = 100
+
+# trades per page of trade history, and the largest page size a request may ask for
+TRADE_HISTORY_PAGE_SIZE = int(os.getenv("TRADE_HISTORY_PAGE_SIZE", "50"))
+TRADE_HISTORY_MAX_PAGE_SIZE = 500
+
 
 # tested, functional, commented
 def buy_stock(user_id, symbol, number_of_shares):
     """ Accepts stock object, number of shares to buy, user_id and updates the holdings
-        and trades_log tables. """
+        and trades_log tables. The funds check, cash debit, trade and position are
+        written atomically in a single statement, so concurrent orders cannot overdraw. """
     
+    # get live stock object
+    stock = create_stock(symbol)
+
+    # ensure stock was fetched
+    if not stock:
+        return {
+            "success": False,
+            "message": "Failed to fetch live stock price."
+        }
+
+    # calculate trade_amount
+    trade_amount = stock.price * number_of_shares
+
+    # instantiate trade and position objects
+    trade = Trade(user_id=user_id, stock=stock, number_of_shares=number_of_shares,
+                  trade_type="BUY", trade_total=trade_amount)
+    position = Position(stock, number_of_shares, user_id)
+
     conn = DBCore.get_connection()
     
     try:
         with conn:
             with conn.cursor() as cur:
-                
-                # get used object
-                user = get_user_by_id(cur, user_id)
 
-                # get live stock object
-                stock = create_stock(symbol)
-                
-                # calculate trade_amount
-                trade_amount = stock.price * number_of_shares
+                # wait for any other order of this user to finish
+                lock_user_orders(cur, user_id)
 
-                # ensure user has sufficient cash_balance to purchase shares
-                if user.cash_balance < trade_amount:
+                # debit cash and log trade and position, only if user has sufficient cash_balance
+                if execute_buy(cur, trade, position) is None:
                     return {
                         "success": False,
                         "message": "Insufficient cash balance to purchases shares."
                     }
 
-                # instantiate trade object
-                trade = Trade(user_id=user_id, stock=stock, number_of_shares=number_of_shares,
-                            trade_type="BUY", trade_total=trade_amount)       
-                
-                # log trade in trades_log table
-                if not log_trade(cur, trade):
-                    return {
-                        "success": False,
-                        "message": "Failed to log trade."
-                    }
-
-                # instantiate position object
-                position = Position(stock, number_of_shares, user_id)
-
-                # log position in positions table
-                if not log_position(cur, position):
-                    return {
-                        "success": False,
-                        "message": "Failed to log position."
-                    }
-
-                # calcuate user's new cash_balance      
-                new_cash_balance = float(user.cash_balance) - trade_amount
-
-                # update user's cash_balance
-                if not update_user_cash_balance(cur, user_id, new_cash_balance):
-                    return {
-                        "success": False,
-                        "message": "Failed to update user cash balance."
-                    }           
-
                 conn.commit()
+                invalidate_portfolio(user_id)
                 return {
                     "success": True,
                     "message": "Shares successfully purchased."
@@ -97,112 +89,44 @@ def buy_stock(user_id, symbol, number_of_shares):
 def sell_stock(user_id, symbol, number_of_shares):
     """ Accepts stock object, number of shares to sell and user_id. Ensures user has
         sufficient long position(s) open to sell desired number of shares. This function
-        DOES NOT allow for short selling. """
+        DOES NOT allow for short selling. Positions are consumed oldest first, server-side
+        in a single statement, and the resulting trades are returned. """
+
+    # instantiate live stock object
+    stock = create_stock(symbol)
+
+    # ensure stock was fetched
+    if not stock:
+        return {
+            "success": False,
+            "message": "Failed to fetch live stock price."
+        }
+
+    conn = DBCore.get_connection()
 
     try:
-        with DBCore.get_connection() as conn:
+        with conn:
             with conn.cursor() as cur:
-                
-                # get positions object with list of positions of single stock
-                positions = get_user_positions_of_equity(cur, user_id, symbol)
-
-                print(positions.total_number_of_shares)
-                
-                # ensure user has sufficient shares to sell desired amount
-                if number_of_shares > positions.total_number_of_shares:
-                    return {
-                        "success": False,
-                        "message": "Insufficient shares to sell."
-                    }
-                
-                # set counters
-                transaction_type = "SELL"
-                total_value_shares_sold = 0
-                position_number = 0
-
-                # instantiate live stock object
-                stock = create_stock(symbol)
-
-                # run loop while shares remain to be sold
-                while number_of_shares > 0:
-
-                    # get earliest opened position object
-                    first_position = positions.positions[position_number]
-
-                    # check if entire position has more shares than user wants to sell
-                    if number_of_shares > first_position.number_of_shares:
-                        max_number_of_shares_for_trade = first_position.number_of_shares
-                    else:
-                        max_number_of_shares_for_trade = number_of_shares
-
-                    # instantiate trade object
-                    trade = Trade(user_id, stock, max_number_of_shares_for_trade, transaction_type)
-
-                    # log trade in trades_log table
-                    if not log_trade(cur, trade):
-                        return {
-                            "success": False,
-                            "message": "Failed to log trade."
-                        }
-                    
-                    # check if position must be closed as number of shares in position is now 0
-                    if max_number_of_shares_for_trade == first_position.number_of_shares:
-                        
-                        # close position
-                        if not close_position(cur, first_position):
-                            return {
-                                "success": False,
-                                "message": "Failed to close position."
-                            }
-                    
-                    # if position will have remaining shares and will need to be updated
-                    else:
-                        
-                        # calculate new number_of_shares and total_value of position
-                        updated_number_of_shares = first_position.number_of_shares - number_of_shares
-                        updated_total_value = updated_number_of_shares * stock.price
-
-                        # update the values in the object
-                        first_position.number_of_shares = updated_number_of_shares
-                        first_position.total_value = updated_total_value
-                        first_position.last_price_per_share = stock.price
-
-                        # update position in positions table
-                        if not update_position(cur, first_position):
-                            return {
-                                "success": False,
-                                "message": "Failed to update position."
-                            }
-                    
-                    # update shares left to sell with number of shares sold in this iteration of loop
-                    number_of_shares -= max_number_of_shares_for_trade
 
-                    # update value of total shares sold to then update cash balance of user
-                    total_value_shares_sold += trade.trade_total
+                # wait for any other order of this user to finish
+                lock_user_orders(cur, user_id)
 
-                    # increment to move onto next position in list if need to sell more shares
-                    position_number += 1
-                
-                # get user object
-                user = get_user_by_id(cur, user_id)
-                
-                # update cash_balance in user object
-                new_user_cash_balance = float(user.cash_balance) + float(total_value_shares_sold)
+                # consume positions FIFO, log trades and credit the user's cash_balance
+                trades_list = execute_sell(cur, user_id, stock, number_of_shares)
 
-                # update cash_balance in users table
-                if not update_user_cash_balance(cur, user_id, new_user_cash_balance):
+                # ensure user had sufficient shares to sell desired amount
+                if not trades_list:
                     return {
                         "success": False,
-                        "message": "Failed to update user cash balance."
+                        "message": "Insufficient shares to sell."
                     }
 
-                # update any remaining positions with live price
-                update_positions_last_price(cur, user_id, stock.symbol, stock.price)
-
                 conn.commit()
+                invalidate_portfolio(user_id)
                 return {
                         "success": True,
-                        "message": "Shares successfully sold."
+                        "message": "Shares successfully sold.",
+                        "trades": trades_list
                     }
         
     except Exception as e:
@@ -213,10 +137,171 @@ def sell_stock(user_id, symbol, number_of_shares):
         }
 
 
+def _reject_basket(results, message):
+    """ Accepts the per-leg results of a basket order and a reason, returns the failed basket
+        result. Legs without an error of their own are marked as not executed. """
+
+    for result in results:
+        if not result["message"]:
+            result["message"] = "Not executed, basket rejected."
+
+    return {
+        "success": False,
+        "message": message,
+        "legs": results
+    }
+
+
+def place_basket_order(user_id, legs):
+    """ Accepts user_id and a list of order legs, each a dictionary with a symbol, a side of
+        "BUY" or "SELL" and a quantity. Quotes of every symbol are fetched in one batch, cash
+        and holdings are validated once for the whole basket and every leg is executed in a
+        single transaction, sells first so that their proceeds can fund the buys. The basket
+        is all or nothing, and the result holds the outcome of each leg. """
+
+    # ensure basket is of a sensible size
+    if not legs or len(legs) > BASKET_MAX_LEGS:
+        return {
+            "success": False,
+            "message": f"A basket order must have between 1 and {BASKET_MAX_LEGS} legs.",
+            "legs": []
+        }
+
+    # normalise legs into per-leg results
+    results = []
+    for leg in legs:
+        results.append({
+            "symbol": str(leg.get("symbol") or "").strip().lower(),
+            "side": str(leg.get("side") or "").strip().upper(),
+            "quantity": valid_num_shares(leg.get("quantity")),
+            "success": False,
+            "message": ""
+        })
+
+    # ensure every leg is well formed
+    for result in results:
+        if result["symbol"].upper() not in ALL_SYMBOLS:
+            result["message"] = "Invalid ticker."
+        elif result["side"] not in ("BUY", "SELL"):
+            result["message"] = "Invalid side, must be BUY or SELL."
+        elif result["quantity"] is None:
+            result["message"] = "Invalid number of shares."
+
+    if any(result["message"] for result in results):
+        return _reject_basket(results, "Invalid basket order.")
+
+    # fetch every quote in one batch
+    stocks = create_stocks(list({result["symbol"] for result in results}))
+
+    for result in results:
+        if not stocks[result["symbol"]]:
+            result["message"] = "Failed to fetch live stock price."
+
+    if any(result["message"] for result in results):
+        return _reject_basket(results, "Failed to fetch live stock prices.")
+
+    # price every leg, and net the sells of each symbol so its positions are consumed once
+    shares_to_sell = {}
+    buy_orders = []
+    buy_total = 0
+    sell_total = 0
+
+    for result in results:
+        stock = stocks[result["symbol"]]
+        result["price_per_share"] = round(stock.price, 2)
+        result["total"] = round(result["price_per_share"] * result["quantity"], 2)
+
+        if result["side"] == "SELL":
+            shares_to_sell[result["symbol"]] = shares_to_sell.get(result["symbol"], 0) + result["quantity"]
+            sell_total += result["total"]
+        else:
+            buy_orders.append((stock, result["quantity"]))
+            buy_total += result["total"]
+
+    sell_orders = [(stocks[symbol], shares) for symbol, shares in shares_to_sell.items()]
+
+    conn = DBCore.get_connection()
+
+    try:
+        with conn:
+            with conn.cursor() as cur:
+
+                # wait for any other order of this user to finish
+                lock_user_orders(cur, user_id)
+
+                # get user object and current holdings
+                user = get_user_by_id(cur, user_id)
+                holdings = get_user_holdings(cur, user_id)
+
+                # ensure user holds enough shares of every symbol sold
+                for result in results:
+                    held = holdings[result["symbol"]].number_of_shares if result["symbol"] in holdings else 0
+                    if result["side"] == "SELL" and held < shares_to_sell[result["symbol"]]:
+                        result["message"] = "Insufficient shares to sell."
+
+                if any(result["message"] for result in results):
+                    return _reject_basket(results, "Insufficient shares to sell.")
+
+                # ensure cash and sale proceeds cover every purchase
+                if float(user.cash_balance) + sell_total < buy_total:
+                    for result in results:
+                        if result["side"] == "BUY":
+                            result["message"] = "Insufficient cash balance to purchase shares."
+                    return _reject_basket(results, "Insufficient cash balance to purchase shares.")
+
+                # consume positions of every sold symbol, then open positions of every bought one
+                sold = execute_basket_sells(cur, user_id, sell_orders)
+                if any(sold.get(stock.symbol, (0, 0))[0] != shares for stock, shares in sell_orders):
+                    conn.rollback()
+                    return _reject_basket(results, "Failed to sell shares.")
+
+                if len(execute_basket_buys(cur, user_id, buy_orders)) != len(buy_orders):
+                    conn.rollback()
+                    return _reject_basket(results, "Failed to purchase shares.")
+
+                # settle the net cash of the basket, only if the balance stays non-negative
+                proceeds = sum(sale_total for shares, sale_total in sold.values())
+                if not adjust_user_cash_balance(cur, user_id, round(proceeds - buy_total, 2)):
+                    conn.rollback()
+                    return _reject_basket(results, "Insufficient cash balance to purchase shares.")
+
+                # record the traded prices as the latest quotes
+                upsert_quotes(cur, {stock.symbol: round(stock.price, 2) for stock in stocks.values()})
+
+                conn.commit()
+                invalidate_portfolio(user_id)
+
+                for result in results:
+                    result["success"] = True
+                    result["message"] = "Shares successfully purchased." if result["side"] == "BUY" else "Shares successfully sold."
+
+                return {
+                    "success": True,
+                    "message": "Basket order executed.",
+                    "legs": results
+                }
+
+    except Exception as e:
+        conn.rollback()
+        return _reject_basket(results, f"Error. Failed to execute basket order: {e}.")
+
+
 # tested, functional, commented
-def get_user_trade_history(user_id, start_date=None, end_date=None):
+def get_user_trade_history(user_id, start_date=None, end_date=None, page_size=None, cursor=None):
     """ Accepts a user_id and optionally start and end dates. Queries
-        trades_log table and returns list of trade objects of user. """
+        trades_log table and returns list of trade objects of user. If page_size
+        is provided, returns one page of at most page_size trades starting at the
+        opaque cursor, along with the cursor of the next page, or None on the last page. """
+
+    # ensure cursor is one this function handed out
+    after = None
+    if cursor:
+        after = decode_page_cursor(cursor)
+        if after is None:
+            return {
+                "success": False,
+                "message": "Invalid page cursor."
+            }
 
     try:
         with DBCore.get_connection() as conn:
@@ -226,8 +311,9 @@ def get_user_trade_history(user_id, start_date=None, end_date=None):
                 if end_date:
                     end_date = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) - timedelta(seconds=1)
 
-                # get list of trade objects from trades_log table
-                trades_list = get_trades(cur, user_id, start_date, end_date)
+                # get list of trade objects from trades_log table, one extra to detect a next page
+                limit = page_size + 1 if page_size else None
+                trades_list = get_trades(cur, user_id, start_date, end_date, limit, after)
 
                 # ensure list exists
                 if not trades_list:
@@ -235,15 +321,21 @@ def get_user_trade_history(user_id, start_date=None, end_date=None):
                         "success": False,
                         "message": "Failed to retrieve user trades from trades_log table."
                     }
-                else:
-                    return {
-                        "success": True,
-                        "message": trades_list
-                    }
+
+                # point the next cursor at the last trade of this page
+                next_cursor = None
+                if page_size and len(trades_list) > page_size:
+                    trades_list = trades_list[:page_size]
+                    next_cursor = encode_page_cursor(trades_list[-1].timestamp, trades_list[-1].trade_id)
+
+                return {
+                    "success": True,
+                    "message": trades_list,
+                    "next_cursor": next_cursor
+                }
             
     except Exception as e:
         return {
             "success": False,
             "message": f"Error. Failed to retrieve user trades: {e}."
         }
-      
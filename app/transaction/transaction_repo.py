@@ -1,20 +1,46 @@
 from app.transaction.transaction_model import Transaction
 
+
+def _transaction_filters(user_id, start_date, end_date):
+    """ Accepts user_id and optionally start and end dates, returns the WHERE clause and
+        parameters selecting the user's transactions in that period. """
+
+    conditions = ["user_id = %s"]
+    params = [user_id]
+
+    if start_date and end_date:
+        conditions.append("timestamp >= %s AND timestamp <= %s")
+        params.extend([start_date, end_date])
+
+    return " AND ".join(conditions), params
+
+
 # tested, functional, commented
-def get_transactions(cur, user_id, start_date, end_date):
-    """ Accepts cursor, user_id and returns list of user's trades as
-        trade objects. If user has not performed any trades, will return
+def get_transactions(cur, user_id, start_date, end_date, limit=None, after=None):
+    """ Accepts cursor, user_id and returns list of user's transactions as
+        transaction objects, newest first. If user has not made any transactions, will return
         and empty list. If start and end date are provided, will filter 
-        results to those dates. """
+        results to those dates. If limit is provided, returns at most limit transactions
+        older than the (timestamp, transaction_id) keyset after, read as a range scan of
+        the transactions (user_id, timestamp, transaction_id) index. """
 
-    # take path depending on whether start and end date were provided
-    if start_date and end_date:
-        cur.execute(""" SELECT * FROM transactions WHERE user_id=%s 
-                    AND timestamp >= %s AND timestamp <= %s 
-                    ORDER BY timestamp DESC """, (user_id, start_date, end_date))
-    else:
-        cur.execute(""" SELECT * FROM transactions WHERE user_id=%s 
-                    ORDER BY timestamp """, (user_id,))
+    where_clause, params = _transaction_filters(user_id, start_date, end_date)
+
+    # continue after the last transaction of the previous page
+    if after:
+        where_clause += " AND (timestamp, transaction_id) < (%s, %s)"
+        params.extend(after)
+
+    limit_clause = ""
+    if limit:
+        limit_clause = "LIMIT %s"
+        params.append(limit)
+
+    cur.execute(f""" SELECT * FROM transactions
+        WHERE {where_clause}
+        ORDER BY timestamp DESC, transaction_id DESC
+        {limit_clause}
+    """, params)
 
     rows = cur.fetchall()
     transactions_list = []
@@ -32,6 +58,18 @@ def get_transactions(cur, user_id, start_date, end_date):
     return transactions_list
 
 
+def count_transactions(cur, user_id, start_date, end_date):
+    """ Accepts cursor, user_id and optionally start and end dates, returns the number of
+        the user's transactions in that period. Answered from the transactions
+        (user_id, timestamp, transaction_id) index. """
+
+    where_clause, params = _transaction_filters(user_id, start_date, end_date)
+
+    cur.execute(f""" SELECT COUNT(*) FROM transactions WHERE {where_clause} """, params)
+
+    return cur.fetchone()[0]
+
+
 # tested, functional, commented
 def log_transaction(cur, transaction):
     """ Accepts cursor and transaction object, inserts it into transactions table. """
@@ -43,4 +81,36 @@ def log_transaction(cur, transaction):
                 transaction.user_id, transaction.amount, transaction.transaction_type
             ))
 
-    return cur.rowcount > 0
\ No newline at end of file
+    return cur.rowcount > 0
+
+
+def get_transactions_fingerprint(cur, user_id, start_date, end_date):
+    """ Accepts cursor, user_id and optionally start and end dates, returns the number and
+        the largest transaction_id of the user's transactions in that period. Transactions
+        are never edited, so the pair changes whenever the period's transactions do. """
+
+    where_clause, params = _transaction_filters(user_id, start_date, end_date)
+
+    cur.execute(f""" SELECT COUNT(*), MAX(transaction_id) FROM transactions WHERE {where_clause} """, params)
+
+    return tuple(cur.fetchone())
+
+
+# columns of an exported transaction, in export order
+TRANSACTION_EXPORT_COLUMNS = ["transaction_id", "timestamp", "transaction_type", "amount"]
+
+
+def select_transactions_for_export(cur, user_id, start_date, end_date, newest_first=False):
+    """ Accepts a (named, server-side) cursor, user_id and optionally start and end dates,
+        executes the query selecting the user's transactions oldest first, or newest first
+        if newest_first is set. Rows are left on the cursor for the caller to fetch in
+        chunks. """
+
+    where_clause, params = _transaction_filters(user_id, start_date, end_date)
+    columns = ", ".join(TRANSACTION_EXPORT_COLUMNS)
+    direction = "DESC" if newest_first else "ASC"
+
+    cur.execute(f""" SELECT {columns} FROM transactions
+        WHERE {where_clause}
+        ORDER BY timestamp {direction}, transaction_id {direction}
+    """, params)
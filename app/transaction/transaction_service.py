@@ -1,15 +1,36 @@
+import os
+
 from app.db_core import DBCore
+from app.utils import encode_page_cursor, decode_page_cursor
 
 from datetime import datetime, timedelta
 
 from app.transaction.transaction_repo import (
-    get_transactions
+    get_transactions,
+    count_transactions
 )
 
+# transactions per page of transaction history, and the largest page size a request may ask for
+TRANSACTION_HISTORY_PAGE_SIZE = int(os.getenv("TRANSACTION_HISTORY_PAGE_SIZE", "25"))
+TRANSACTION_HISTORY_MAX_PAGE_SIZE = 500
+
 # tested, functional, commented
-def get_user_transaction_history(user_id, start_date=None, end_date=None):
+def get_user_transaction_history(user_id, start_date=None, end_date=None, page_size=None, cursor=None):
     """ Accepts a user_id and optionally start and end dates. Queries
-        transactions table and returns list of transaction objects of user. """
+        transactions table and returns list of transaction objects of user, newest first.
+        If page_size is provided, returns one page of at most page_size transactions
+        starting at the opaque cursor, the cursor of the next page, or None on the last
+        page, and the total number of transactions in the period. """
+
+    # ensure cursor is one this function handed out
+    after = None
+    if cursor:
+        after = decode_page_cursor(cursor)
+        if after is None:
+            return {
+                "success": False,
+                "message": "Invalid page cursor."
+            }
 
     try:
         with DBCore.get_connection() as conn:
@@ -19,8 +40,9 @@ def get_user_transaction_history(user_id, start_date=None, end_date=None):
                 if end_date:
                     end_date = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) - timedelta(seconds=1)
 
-                # get list of transaction objects from transactions table
-                transactions_list = get_transactions(cur, user_id, start_date, end_date)
+                # get list of transaction objects from transactions table, one extra to detect a next page
+                limit = page_size + 1 if page_size else None
+                transactions_list = get_transactions(cur, user_id, start_date, end_date, limit, after)
 
                 # ensure list exists
                 if len(transactions_list) < 1:
@@ -28,15 +50,30 @@ def get_user_transaction_history(user_id, start_date=None, end_date=None):
                         "success": False,
                         "message": "User has no transactions to date."
                     }
-                else:
+
+                # full history, as used by statements
+                if not page_size:
                     return {
                         "success": True,
                         "message": transactions_list
                     }
+
+                # point the next cursor at the last transaction of this page
+                next_cursor = None
+                if len(transactions_list) > page_size:
+                    transactions_list = transactions_list[:page_size]
+                    last = transactions_list[-1]
+                    next_cursor = encode_page_cursor(last.timestamp, last.transaction_id)
+
+                return {
+                    "success": True,
+                    "message": transactions_list,
+                    "next_cursor": next_cursor,
+                    "total": count_transactions(cur, user_id, start_date, end_date)
+                }
             
     except Exception as e:
         return {
             "success": False,
             "message": f"Error. Failed to retrieve user transactions: {e}."
         }
-      
\ No newline at end of file
@@ -23,8 +23,9 @@ def insert_user(cur, user):
 # tested, functional, commented
 def get_user_by_email(cur, email):
     """ Accepts cursor and email address, queries users table to find user based on
-        email address, returns user object. """
-    cur.execute("""SELECT * FROM users WHERE email=%s""", (email,))
+        email address, returns user object. Emails are matched case-insensitively,
+        backed by the unique index on lower(email). """
+    cur.execute("""SELECT * FROM users WHERE lower(email)=lower(%s)""", (email,))
     
     row = cur.fetchone()
     
@@ -65,6 +66,23 @@ def get_user_by_id(cur, id):
         return None
 
 
+def get_user_id_ranges(cur, chunk_size, first_user_id=None, last_user_id=None):
+    """ Accepts cursor, chunk size and optionally bounds on user ids. Splits the ids of the
+        users within the bounds into inclusive (first id, last id) ranges of chunk_size users
+        each, read from the primary key, so gaps in the ids leave no empty ranges. """
+
+    cur.execute("""
+        WITH ids AS (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY id) - 1 AS n
+            FROM users
+            WHERE id >= COALESCE(%(first)s, id) AND id <= COALESCE(%(last)s, id)
+        )
+        SELECT MIN(id), MAX(id) FROM ids GROUP BY n / %(chunk_size)s ORDER BY 1
+    """, {"first": first_user_id, "last": last_user_id, "chunk_size": chunk_size})
+
+    return cur.fetchall()
+
+
 # tested, functional, commented
 def remove_user(cur, user_id):
     """ Accepts cursor and user_id, removes user from users table based on user_id. """
@@ -89,6 +107,18 @@ def insert_user_password(cur, user_id, new_password):
     return cur.rowcount > 0
 
 
+# advisory lock namespace serializing the orders and cash movements of each user
+USER_ORDER_LOCK_NAMESPACE = 1
+
+
+def lock_user_orders(cur, user_id):
+    """ Accepts cursor and user_id, takes a transaction-level advisory lock on the user so
+        their orders and cash movements run one at a time. Other users are not blocked and
+        the lock is released when the transaction ends. """
+
+    cur.execute(""" SELECT pg_advisory_xact_lock(%s, %s) """, (USER_ORDER_LOCK_NAMESPACE, user_id))
+
+
 # tested, functional, commented
 def update_user_cash_balance(cur, user_id, new_balance):
     """  Accepts cursor, user_id and new_balance, updates user's cash balance in users table. """
@@ -97,6 +127,18 @@ def update_user_cash_balance(cur, user_id, new_balance):
     return cur.rowcount > 0
 
 
+def adjust_user_cash_balance(cur, user_id, amount):
+    """ Accepts cursor, user_id and a signed amount, adds the amount to the user's cash
+        balance only if the balance stays non-negative. Returns true if it was applied. """
+
+    cur.execute("""
+        UPDATE users SET cash_balance = cash_balance + %s
+        WHERE id=%s AND cash_balance + %s >= 0
+    """, (amount, user_id, amount))
+
+    return cur.rowcount > 0
+
+
 # tested, functional, commented
 def insert_user_first_name(cur, user_id, first_name):
     """ Accepts a cursor, user_id and first_name, updates user's first name in table users. """
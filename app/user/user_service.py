@@ -1,4 +1,5 @@
 from app.db_core import DBCore
+from app.portfolio.portfolio_cache import invalidate_portfolio
 from app.user.user_repo import (
     insert_user,
     get_user_by_email,
@@ -10,6 +11,7 @@ from app.user.user_repo import (
     insert_user_first_name,
     insert_user_last_name,
     insert_user_dob,
+    lock_user_orders
 )
 
 from app.transaction.transaction_model import Transaction
@@ -24,10 +26,6 @@ from app.utils import  (
 )
 
 
-from app.position.position_service import (
-    update_positions_in_table
-)
-
 from app.position.position_repo import (
     get_all_user_positions
 )
@@ -129,6 +127,7 @@ def delete_user(user_id):
                     }
                 
                 conn.commit()
+                invalidate_portfolio(user_id)
                 return {
                     "success": True,
                     "message": "User deleted successfully."
@@ -225,6 +224,9 @@ def deposit_user_funds(user_id, amount):
         with conn:
             with conn.cursor() as cur:
 
+                # wait for any order or cash movement of this user to finish
+                lock_user_orders(cur, user_id)
+
                 # get user object
                 user = get_user_by_id(cur, user_id)
 
@@ -250,6 +252,7 @@ def deposit_user_funds(user_id, amount):
                     }                  
 
                 conn.commit()
+                invalidate_portfolio(user_id)
                 return {
                     "success": True,
                     "message": "Funds successfully deposited."
@@ -271,6 +274,9 @@ def withdraw_user_funds(user_id, amount):
     try:
         with conn:
             with conn.cursor() as cur:
+
+                # wait for any order or cash movement of this user to finish
+                lock_user_orders(cur, user_id)
                 
                 # get user object
                 user = get_user_by_id(cur, user_id)
@@ -304,6 +310,7 @@ def withdraw_user_funds(user_id, amount):
                     }                            
 
                 conn.commit()
+                invalidate_portfolio(user_id)
                 return {
                     "success": True,
                     "message": "Funds successfully withdrawn."
@@ -1,5 +1,8 @@
+import base64
 import bcrypt
+import json
 import re
+from datetime import datetime, timedelta
 
 # tested, functional, commented
 def email_is_valid(email):
@@ -190,4 +193,47 @@ def valid_num_shares(num_shares):
         return num_shares
     
     except (ValueError, TypeError):
-        return None
\ No newline at end of file
+        return None
+
+
+def encode_page_cursor(timestamp, row_id):
+    """ Accepts the timestamp and id of the last row of a page, returns an opaque url safe
+        cursor pointing after it. """
+
+    payload = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_page_cursor(cursor):
+    """ Accepts a cursor made by encode_page_cursor, returns its (timestamp, row_id) tuple,
+        or None if the cursor is malformed. """
+
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(payload)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def valid_page_size(page_size, default, maximum):
+    """ Accepts a requested page size, returns it clamped between 1 and maximum, or default
+        if it is missing or not a number. """
+
+    try:
+        return min(max(int(page_size), 1), maximum)
+    except (ValueError, TypeError):
+        return default
+
+
+def parse_date_range(start_date, end_date):
+    """ Accepts optional "YYYY-MM-DD" start and end dates, returns them as datetimes, the end
+        date moved to the last second of its day so that every row of the day is included.
+        Raises ValueError if either is malformed. """
+
+    if start_date:
+        start_date = datetime.strptime(start_date, "%Y-%m-%d")
+    if end_date:
+        end_date = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) - timedelta(seconds=1)
+
+    return start_date, end_date
@@ -0,0 +1,33 @@
+import psycopg2
+
+from app.db_core import ConnectionPool, DBCore
+
+
+class FakeConnection:
+    closed = 0
+
+
+def test_fill_opens_min_size_connections(monkeypatch):
+    """ A filled pool holds min_size idle connections before anything checks one out. """
+
+    pool = ConnectionPool(min_size=3, max_size=5)
+    monkeypatch.setattr(pool, "_connect", FakeConnection)
+
+    pool.fill()
+
+    stats = pool.stats()
+    assert (stats["size"], stats["idle"]) == (3, 3)
+
+
+def test_warm_pool_tolerates_an_unreachable_database(monkeypatch):
+    """ The app still starts when the database cannot be reached, connecting on first use. """
+
+    def connect():
+        raise psycopg2.OperationalError("could not connect")
+
+    pool = ConnectionPool(min_size=2)
+    monkeypatch.setattr(pool, "_connect", connect)
+    monkeypatch.setattr(DBCore, "pool", pool)
+
+    assert DBCore.warm_pool() is False
+    assert pool.stats()["size"] == 0
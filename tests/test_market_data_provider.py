@@ -0,0 +1,24 @@
+from app.stock.market_data_provider import SyntheticProvider
+
+
+def test_synthetic_prices_do_not_depend_on_earlier_quotes():
+    """ Providers quoted at different ticks agree at every tick they share. """
+
+    now = [1000000.0]
+    providers = [SyntheticProvider(seed=1, clock=lambda: now[0]) for _ in range(2)]
+    start = now[0]
+
+    # the first provider is quoted every few seconds, the second only at the shared ticks
+    for elapsed in (5, 10):
+        now[0] = start + elapsed
+        providers[0].get_price("AAPL")
+    assert providers[0].get_price("AAPL") == providers[1].get_price("AAPL")
+
+    # and after a gap spanning many checkpoints
+    now[0] = start + 24 * 3600
+    providers[0].get_price("AAPL")
+    now[0] = start + 30 * 24 * 3600 + 7
+    prices = [[provider.get_price(f"S{i}") for i in range(20)] + [provider.get_price("AAPL")]
+              for provider in providers]
+    assert prices[0] == prices[1]
+    assert all(price > 0 for price in prices[0])
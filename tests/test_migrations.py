@@ -0,0 +1,45 @@
+import pytest
+
+from app.setup.migrations import MIGRATIONS, MigrationError, apply_migration
+
+
+class FakeConnection:
+    """ Records statements, answering every query with the given rows. """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+        self.autocommit = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=None):
+        self.statements.append(" ".join(str(query).split()))
+
+    def fetchall(self):
+        return self.rows
+
+    def commit(self):
+        pass
+
+    rollback = commit
+
+
+def test_unique_email_migration_reports_duplicates_before_building():
+    """ Case-only duplicate emails stop the migration with a readable error. """
+
+    migration = next(m for m in MIGRATIONS if m.version == 5)
+    conn = FakeConnection([("ann@example.com", [3, 8])])
+
+    with pytest.raises(MigrationError, match=r"Migration 5 .*ann@example\.com \(users 3, 8\)"):
+        apply_migration(conn, migration, concurrently=True)
+
+    assert not any("CREATE" in statement or "schema_migrations" in statement
+                   for statement in conn.statements)
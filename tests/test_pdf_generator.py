@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+from app import pdf_generator
+from app.portfolio.portfolio_model import Portfolio
+from app.user.user_model import User
+
+
+def test_portfolio_statement_of_empty_portfolio(monkeypatch):
+    """ A user holding no equities gets a statement with the empty-table message. """
+
+    user = User("empty", "user", "2000-01-01", "empty@example.com", cash_balance=1000.00, id=1)
+    portfolio = Portfolio(user)
+    assert portfolio.positions is None
+
+    monkeypatch.setattr(pdf_generator, "get_user", lambda user_id: user)
+    monkeypatch.setattr(pdf_generator, "get_portfolio", lambda user_id, use_cache=True: portfolio)
+
+    filepath = pdf_generator.generate_portfolio_statement(user.id, "test_empty_portfolio.pdf")
+    try:
+        assert os.path.getsize(filepath) > 0
+
+        pypdf = pytest.importorskip("pypdf")
+        text = "".join(page.extract_text() for page in pypdf.PdfReader(filepath).pages)
+        assert "You currently hold no equities." in text
+    finally:
+        os.remove(filepath)
@@ -0,0 +1,58 @@
+from app.quote import quote_service
+
+
+class FakeConnection:
+    """ Records statements and whether a transaction is open, like a psycopg2 connection. """
+
+    def __init__(self):
+        self.statements = []
+        self.in_transaction = False
+        self.rowcount = 0
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.in_transaction = False
+        return False
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=None):
+        self.statements.append(" ".join(query.split()))
+        self.in_transaction = True
+        self._rows = [("AAPL",)] if "DISTINCT symbol" in query else [(True,)]
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return self._rows
+
+    def commit(self):
+        self.in_transaction = False
+
+    rollback = commit
+
+
+def test_refresh_quotes_fetches_prices_outside_a_transaction(monkeypatch):
+    """ The refresh lock is held across the fetch, but no transaction is. """
+
+    conn = FakeConnection()
+    monkeypatch.setattr(quote_service.DBCore, "get_dedicated_connection", lambda: conn)
+
+    def live_stock_prices(symbols):
+        assert not conn.in_transaction
+        return {symbol: 100.0 for symbol in symbols}
+
+    monkeypatch.setattr(quote_service, "live_stock_prices", live_stock_prices)
+    monkeypatch.setattr(quote_service, "upsert_quotes", lambda cur, prices: cur.execute("UPSERT"))
+
+    result = quote_service.refresh_quotes()
+
+    assert result["success"], result["message"]
+    assert conn.statements[0].startswith("SELECT pg_try_advisory_lock")
+    assert conn.statements[-1].startswith("SELECT pg_advisory_unlock")
+    assert not conn.in_transaction
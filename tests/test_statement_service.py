@@ -0,0 +1,81 @@
+import errno
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.statement import statement_service
+from app.statement.statement_cache import StatementCache, statement_key
+from app.statement.statement_service import DONE, FAILED, PENDING, StatementQueue
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = StatementCache(directory=str(tmp_path))
+    monkeypatch.setattr(statement_service, "STATEMENT_CACHE", cache)
+    return cache
+
+
+def test_job_state_is_shared_between_queues(cache):
+    """ A job queued by one process can be followed and downloaded from another. """
+
+    key = statement_key("trades", 1, None, None, [3, 42])
+    cache.set_job_state(key, PENDING)
+    queue = StatementQueue()
+
+    assert queue.get(key, 1).status == PENDING
+    assert queue.get(key, 2) is None
+    assert queue.get("../1-trades-" + "0" * 64, 1) is None
+
+    with open(cache.path(key), "wb") as file:
+        file.write(b"%PDF")
+    job = queue.get(key, 1)
+    assert (job.status, job.kind, job.filepath) == (DONE, "trades", cache.path(key))
+
+
+def test_stale_pending_job_is_reported_failed(cache):
+    """ A job whose rendering process went away does not stay pending forever. """
+
+    key = statement_key("portfolio", 1, None, None, [])
+    cache.set_job_state(key, PENDING)
+
+    assert StatementQueue(job_ttl=0).get(key, 1).to_dict()["status"] == FAILED
+
+
+def test_broken_pool_is_replaced():
+    """ A worker dying does not break every later statement request. """
+
+    queue = StatementQueue(workers=1)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            queue._submit(os._exit, 1).result()
+        assert queue._submit(abs, -3).result() == 3
+    finally:
+        queue.shutdown()
+
+
+def test_put_copies_statements_rendered_on_another_filesystem(cache, tmp_path, monkeypatch):
+    """ A statement that cannot be renamed into the cache is copied into it instead. """
+
+    render_dir = tmp_path / "render"
+    render_dir.mkdir()
+    source = render_dir / "statement.pdf"
+    source.write_bytes(b"%PDF")
+
+    replace = os.replace
+
+    def cross_device_replace(src, dst):
+        if os.path.dirname(src) != os.path.dirname(dst):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", cross_device_replace)
+
+    key = statement_key("trades", 1, None, None, [])
+    path = cache.put(key, str(source))
+
+    assert path == cache.path(key)
+    with open(path, "rb") as file:
+        assert file.read() == b"%PDF"
+    assert not source.exists()
+    assert sorted(os.listdir(tmp_path)) == sorted(["render", f"{key}.pdf"])
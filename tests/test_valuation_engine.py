@@ -0,0 +1,29 @@
+import subprocess
+import sys
+
+from app.portfolio.valuation_engine import lots_from_rows, value_lots
+
+
+def test_unquoted_holdings_are_valued_at_their_own_fallback_price():
+    """ Users holding the same unquoted symbol are each valued at their own last price. """
+
+    lots = lots_from_rows([
+        (1, "ABC", "ABC Inc", 2, 10.0, 12.0),
+        (1, "ABC", "ABC Inc", 3, 11.0, 12.0),
+        (2, "ABC", "ABC Inc", 1, 10.0, 15.0),
+        (2, "XYZ", "XYZ Inc", 4, 5.0, 6.0)
+    ])
+    valuation = value_lots(lots, {"XYZ": 7.0})
+
+    first = valuation.user_positions(1)["ABC"]
+    assert (first.number_of_shares, first.last_price_per_share, first.total_value) == (5, 12.0, 60.0)
+    assert valuation.user_positions(2)["ABC"].last_price_per_share == 15.0
+    assert valuation.user_totals(2) == (43.0, 30.0, 13.0)
+
+
+def test_position_repo_does_not_load_numpy():
+    """ Importing the repository leaves NumPy to callers of the valuation engine. """
+
+    code = "import sys, app.position.position_repo; print('numpy' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"